@@ -0,0 +1,189 @@
+import asyncio
+import os
+from typing import Any, BinaryIO, Dict, List, Tuple
+
+import starlette.requests
+from fastapi import HTTPException
+from PIL import Image
+from starlette.formparsers import MultiPartParser
+from starlette.responses import JSONResponse
+
+from color_detection import RASTER_EXTENSIONS
+from converters import RENDER_PIXELS
+from pipeline import VECTOR_EXTENSIONS
+
+# Upload limits, overridable through the environment
+MAX_FILE_BYTES = int(os.environ.get("COLOR_MAX_FILE_BYTES", str(100 * 1024 * 1024)))
+MAX_REQUEST_BYTES = int(os.environ.get("COLOR_MAX_REQUEST_BYTES", str(1024 * 1024 * 1024)))
+# Uploaded files larger than this are spooled to a temporary file while the body streams in
+SPOOL_BYTES = int(os.environ.get("COLOR_SPOOL_BYTES", str(1024 * 1024)))
+# Estimated memory all admitted /upload batches may hold at once
+MEMORY_BUDGET_BYTES = int(os.environ.get("COLOR_MEMORY_BUDGET_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Seconds a batch may wait for budget before it is rejected with 429
+ADMISSION_WAIT = float(os.environ.get("COLOR_ADMISSION_WAIT", "10"))
+# Retry-After sent with 429 responses
+RETRY_AFTER = int(os.environ.get("COLOR_RETRY_AFTER", "5"))
+# Working copies made of a decoded image (RGBA array, opaque pixel copy, float copy)
+DECODE_OVERHEAD = 3
+
+
+
+class BodyLimitMiddleware:
+    """
+    Reject request bodies over `max_bytes` on the upload routes: at once
+    from Content-Length, and while streaming for chunked bodies or clients
+    that send more than they declared.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_REQUEST_BYTES, paths: Tuple[str, ...] = ("/upload", "/jobs")):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse({"detail": self._detail()}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    def _detail(self) -> str:
+        return f"Request body exceeds {self.max_bytes} bytes"
+
+
+class LimitedMultiPartParser(MultiPartParser):
+    """
+    Starlette's multipart parser with a per-file cap enforced while the
+    body streams in: a file part is rejected with 413 as soon as it passes
+    `max_part_bytes`, before the rest of it is spooled to disk. Files over
+    `max_file_size` are spooled to a temporary file instead of memory.
+    """
+
+    max_file_size = SPOOL_BYTES
+    max_part_bytes = MAX_FILE_BYTES
+
+    def on_part_begin(self) -> None:
+        super().on_part_begin()
+        self._part_bytes = 0
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        file = self._current_part.file
+        if file is not None:
+            self._part_bytes += end - start
+            if self._part_bytes > self.max_part_bytes:
+                for spooled in self._files_to_close_on_error:
+                    spooled.close()
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"{file.filename} exceeds the {self.max_part_bytes} byte per-file limit",
+                )
+        super().on_part_data(data, start, end)
+
+
+# Request.form() builds its parser from this module-level name
+starlette.requests.MultiPartParser = LimitedMultiPartParser
+
+
+def estimate_decoded_bytes(filename: str, file: BinaryIO, size: int, options: Dict[str, Any], workers: int) -> int:
+    """
+    Rough peak memory for decoding and clustering one file:
+    - Raster images: width x height from the header only, as RGBA, times
+      DECODE_OVERHEAD
+    - PDF/AI/EPS: one RENDER_PIXELS page per worker that can render it at
+      once (more than one only for multi-page requests)
+    - Anything else: a small multiple of its size
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in RASTER_EXTENSIONS:
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+            return width * height * 4 * DECODE_OVERHEAD
+        except Exception:
+            return size * DECODE_OVERHEAD
+        finally:
+            file.seek(0)
+    if ext in VECTOR_EXTENSIONS:
+        pages = options.get("pages", 1)
+        concurrent_pages = min(pages or workers, workers)
+        return RENDER_PIXELS * 4 * DECODE_OVERHEAD * max(1, concurrent_pages)
+    return size * 2
+
+
+def batch_cost(files: List[Any], options: Dict[str, Any], workers: int) -> int:
+    """
+    Estimated memory of a batch: every upload is held in memory while the
+    batch runs, and at most `workers` files are decoded at the same time.
+    """
+    sizes = [file.size or 0 for file in files]
+    decoded = sorted(
+        (estimate_decoded_bytes(file.filename, file.file, size, options, workers) for file, size in zip(files, sizes)),
+        reverse=True,
+    )
+    return sum(sizes) + sum(decoded[:workers])
+
+
+class MemoryBudget:
+    """
+    Global admission control for batches: each batch reserves its estimated
+    memory before it is read in and releases it when its last result is
+    sent. A batch that doesn't fit waits up to `wait` seconds for others to
+    finish, then is rejected with 429 and Retry-After; one that could never
+    fit is rejected with 413.
+    """
+
+    def __init__(self, capacity: int = MEMORY_BUDGET_BYTES, wait: float = ADMISSION_WAIT,
+                 retry_after: int = RETRY_AFTER):
+        self.capacity = capacity
+        self.wait = wait
+        self.retry_after = retry_after
+        self.used = 0
+        self.rejected = 0
+        self._changed = None
+
+    async def acquire(self, cost: int) -> None:
+        if cost > self.capacity:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch needs about {cost} bytes, more than the {self.capacity} byte memory budget",
+            )
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        async with self._changed:
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait_for(lambda: self.used + cost <= self.capacity),
+                    self.wait,
+                )
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=429,
+                    detail="Server is busy, retry later",
+                    headers={"Retry-After": str(self.retry_after)},
+                )
+            self.used += cost
+
+    async def release(self, cost: int) -> None:
+        async with self._changed:
+            self.used -= cost
+            self._changed.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity, "used": self.used, "rejected": self.rejected}
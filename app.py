@@ -1,481 +1,686 @@
-#this code ouptu is in Hexadecimal format
-from fastapi import FastAPI, UploadFile, File
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
-import uvicorn
-from color_detection import detect_colors
-import os
-from typing import Dict, Any, List
-import base64
-from io import BytesIO
-import fitz  # PyMuPDF for PDF -> PNG conversion
-import subprocess
-import shutil
-from PIL import Image
-from fastapi.middleware.cors import CORSMiddleware
-
-app = FastAPI(title="Color Detection API")
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["#your    site name"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Create uploads directory if it doesn't exist
-os.makedirs("uploads", exist_ok=True)
-
-@app.get("/", response_class=HTMLResponse)
-async def get_upload_page():
-    return """
-    <!DOCTYPE html>
-    <html>
-        <head>
-            <title>Color Detection</title>
-            <style>
-                body {
-                    font-family: Arial, sans-serif;
-                    max-width: 1200px;
-                    margin: 0 auto;
-                    padding: 20px;
-                    background-color: #f5f5f5;
-                }
-                .container {
-                    background-color: white;
-                    padding: 20px;
-                    border-radius: 8px;
-                    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-                }
-                h1 {
-                    color: #333;
-                    text-align: center;
-                }
-                .upload-form {
-                    display: flex;
-                    flex-direction: column;
-                    gap: 20px;
-                    align-items: center;
-                }
-                .file-input {
-                    padding: 10px;
-                    border: 2px dashed #ccc;
-                    border-radius: 4px;
-                    width: 100%;
-                    max-width: 400px;
-                    display: none;
-                }
-                .submit-btn {
-                    background-color: #4CAF50;
-                    color: white;
-                    padding: 10px 20px;
-                    border: none;
-                    border-radius: 4px;
-                    cursor: pointer;
-                    font-size: 16px;
-                }
-                .submit-btn:hover {
-                    background-color: #45a049;
-                }
-                #result {
-                    margin-top: 20px;
-                    padding: 20px;
-                    border-radius: 4px;
-                    display: none;
-                }
-                .color-box {
-                    display: inline-block;
-                    width: 20px;
-                    height: 20px;
-                    margin-right: 5px;
-                    border: 1px solid #ccc;
-                    vertical-align: middle;
-                }
-                .logo-result {
-                    border: 1px solid #ddd;
-                    padding: 20px;
-                    margin: 20px 0;
-                    border-radius: 8px;
-                    background-color: white;
-                }
-                .logo-preview {
-                    max-width: 200px;
-                    max-height: 200px;
-                    margin: 10px 0;
-                }
-                .colors-grid {
-                    display: grid;
-                    grid-template-columns: repeat(auto-fill, minmax(150px, 1fr));
-                    gap: 10px;
-                    margin-top: 10px;
-                }
-                .color-item {
-                    display: flex;
-                    align-items: center;
-                    gap: 5px;
-                }
-                .drop-zone {
-                    border: 2px dashed #ccc;
-                    padding: 20px;
-                    text-align: center;
-                    border-radius: 4px;
-                    cursor: pointer;
-                    transition: border-color 0.3s ease;
-                }
-                .drop-zone:hover {
-                    border-color: #4CAF50;
-                }
-                .drop-zone.dragover {
-                    border-color: #4CAF50;
-                    background-color: #f0f9f0;
-                }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1>Color Detection</h1>
-                <form class="upload-form" id="uploadForm">
-                    <div class="drop-zone" id="dropZone">
-                        <p>Drag and drop up to 100 logo files here or click to select</p>
-                        <input type="file" 
-                               class="file-input"
-                               id="file-input"
-                               accept=".png,.jpg,.jpeg,.svg,.pdf,.ai,.eps,.epm,application/pdf,application/postscript"
-                               multiple>
-                    </div>
-                    <button type="submit" class="submit-btn" id="detectBtn">Detect Colors</button>
-                </form>
-                <div id="loading" style="display:none; text-align:center; margin-top:20px; font-weight:bold; color:#4CAF50;">Uploading and processing files...</div>
-                <div id="result"></div>
-            </div>
-            <script>
-                const dropZone = document.getElementById('dropZone');
-                const fileInput = document.getElementById('file-input');
-                const resultDiv = document.getElementById('result');
-
-                // Drag and drop handlers
-                dropZone.addEventListener('dragover', (e) => {
-                    e.preventDefault();
-                    dropZone.classList.add('dragover');
-                });
-
-                dropZone.addEventListener('dragleave', () => {
-                    dropZone.classList.remove('dragover');
-                });
-
-                dropZone.addEventListener('drop', (e) => {
-                    e.preventDefault();
-                    dropZone.classList.remove('dragover');
-                    fileInput.files = e.dataTransfer.files;
-                });
-
-                dropZone.addEventListener('click', () => {
-                    fileInput.click();
-                });
-
-                document.getElementById('uploadForm').onsubmit = async (e) => {
-                    e.preventDefault();
-                    const detectBtn = document.getElementById('detectBtn');
-                    const loadingDiv = document.getElementById('loading');
-                    detectBtn.disabled = true;
-                    loadingDiv.style.display = 'block';
-                    
-                    if (!fileInput.files.length) {
-                        alert('Please select at least one file');
-                        detectBtn.disabled = false;
-                        loadingDiv.style.display = 'none';
-                        return;
-                    }
-
-                    if (fileInput.files.length > 100) {
-                        alert('Maximum 100 files allowed');
-                        detectBtn.disabled = false;
-                        loadingDiv.style.display = 'none';
-                        return;
-                    }
-
-                    const formData = new FormData();
-                    for (let file of fileInput.files) {
-                        formData.append('files', file);
-                    }
-
-                    try {
-                        const response = await fetch('/upload', {
-                            method: 'POST',
-                            body: formData
-                        });
-                        const data = await response.json();
-                        
-                        let resultsHtml = '<h2>Results:</h2>';
-                        
-                        data.results.forEach(result => {
-                            resultsHtml += `
-                                <div class="logo-result">
-                                    <h3>${result.filename}</h3>
-                                    <img src="${result.preview}" class="logo-preview" alt="${result.filename}">
-                                    <p>Total Colors Detected: ${result.count}</p>
-                                    <div class="colors-grid">
-                                        ${result.colors.map(color => `
-                                            <div class="color-item">
-                                                <span class="color-box" style="background-color: ${color}"></span>
-                                                <span>${color}</span>
-                                            </div>
-                                        `).join('')}
-                                    </div>
-                                </div>
-                            `;
-                        });
-                        
-                        resultDiv.innerHTML = resultsHtml;
-                        resultDiv.style.display = 'block';
-                    } catch (error) {
-                        alert('Error uploading files');
-                        console.error(error);
-                    } finally {
-                        detectBtn.disabled = false;
-                        loadingDiv.style.display = 'none';
-                    }
-                };
-            </script>
-        </body>
-    </html>
-    """
-
-def _convert_pdf_to_png(pdf_path: str) -> str:
-    """
-    Convert the first page of a PDF to a high-resolution PNG.
-    Returns the path to the generated PNG file.
-    """
-    doc = fitz.open(pdf_path)
-    if len(doc) == 0:
-        doc.close()
-        raise ValueError("PDF has no pages")
-    page = doc[0]
-    # Use a scaling matrix for higher resolution rendering
-    matrix = fitz.Matrix(2.0, 2.0)
-    pix = page.get_pixmap(matrix=matrix)
-    png_path = os.path.splitext(pdf_path)[0] + "_page1.png"
-    pix.save(png_path)
-    doc.close()
-    return png_path
-
-
-def _convert_ai_to_png(ai_path: str) -> str:
-    """
-    Convert an Adobe Illustrator (.ai) file to PNG using a 3-level fallback:
-    1) Try to open directly with PyMuPDF and treat as PDF.
-    2) Fallback to Ghostscript to create a PDF, then reuse the PDF -> PNG pipeline.
-    3) Final fallback to ImageMagick (`magick`) to rasterize directly to PNG.
-    Returns the path to the generated PNG file.
-    """
-    # 1) Try to treat the file as a PDF-compatible AI using PyMuPDF directly
-    try:
-        doc = fitz.open(ai_path)
-        if len(doc) == 0:
-            doc.close()
-        else:
-            doc.close()
-            return _convert_pdf_to_png(ai_path)
-    except Exception:
-        # PyMuPDF couldn't handle it as a PDF-compatible file; continue to next fallback
-        pass
-
-    # 2) Fallback: use Ghostscript to convert AI -> PDF, then reuse PDF -> PNG
-    pdf_path = os.path.splitext(ai_path)[0] + ".pdf"
-    gs_executable = shutil.which("gswin64c") or shutil.which("gswin32c") or shutil.which("gs")
-    if gs_executable:
-        cmd = [
-            gs_executable,
-            "-dSAFER",
-            "-dBATCH",
-            "-dNOPAUSE",
-            "-sDEVICE=pdfwrite",
-            f"-sOutputFile={pdf_path}",
-            ai_path,
-        ]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if result.returncode == 0 and os.path.exists(pdf_path):
-            try:
-                png_path = _convert_pdf_to_png(pdf_path)
-                return png_path
-            finally:
-                if os.path.exists(pdf_path):
-                    os.remove(pdf_path)
-
-    # 3) Final fallback: use ImageMagick (`magick`) to rasterize AI -> PNG directly
-    magick_executable = shutil.which("magick") or shutil.which("convert")
-    if magick_executable:
-        png_path = os.path.splitext(ai_path)[0] + "_page1.png"
-        cmd = [
-            magick_executable,
-            ai_path,
-            png_path,
-        ]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if result.returncode == 0 and os.path.exists(png_path):
-            return png_path
-
-    # If all fallbacks fail, surface a clear, user-friendly error
-    raise RuntimeError("This vector file is a raw Illustrator-only format and cannot be processed.")
-
-
-def _convert_eps_to_png(eps_path: str) -> str:
-    """
-    Convert an EPS/EPM file to PNG using a 3-level fallback:
-    1) Try to open directly with PyMuPDF and treat as PDF.
-    2) Fallback to Ghostscript to create a PDF, then reuse the PDF -> PNG pipeline.
-    3) Final fallback to ImageMagick (`magick`) to rasterize directly to PNG.
-    Returns the path to the generated PNG file.
-    """
-    # 1) Try to treat the file as a PDF-compatible EPS/EPM using PyMuPDF directly
-    try:
-        doc = fitz.open(eps_path)
-        if len(doc) == 0:
-            doc.close()
-        else:
-            doc.close()
-            return _convert_pdf_to_png(eps_path)
-    except Exception:
-        # PyMuPDF couldn't handle it as a PDF-compatible file; continue to next fallback
-        pass
-
-    # 2) Fallback: use Ghostscript to convert EPS/EPM -> PDF, then reuse PDF -> PNG
-    pdf_path = os.path.splitext(eps_path)[0] + ".pdf"
-    gs_executable = shutil.which("gswin64c") or shutil.which("gswin32c") or shutil.which("gs")
-    if gs_executable:
-        cmd = [
-            gs_executable,
-            "-dSAFER",
-            "-dBATCH",
-            "-dNOPAUSE",
-            "-sDEVICE=pdfwrite",
-            f"-sOutputFile={pdf_path}",
-            eps_path,
-        ]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if result.returncode == 0 and os.path.exists(pdf_path):
-            try:
-                png_path = _convert_pdf_to_png(pdf_path)
-                return png_path
-            finally:
-                if os.path.exists(pdf_path):
-                    os.remove(pdf_path)
-
-    # 3) Final fallback: use ImageMagick (`magick`) to rasterize EPS/EPM -> PNG directly
-    magick_executable = shutil.which("magick") or shutil.which("convert")
-    if magick_executable:
-        png_path = os.path.splitext(eps_path)[0] + "_page1.png"
-        cmd = [
-            magick_executable,
-            eps_path,
-            png_path,
-        ]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if result.returncode == 0 and os.path.exists(png_path):
-            return png_path
-
-    # If all fallbacks fail, surface a clear, user-friendly error
-    raise RuntimeError("This vector file is a raw Illustrator-only format and cannot be processed.")
-
-
-def _prepare_raster_image_for_detection(image_path: str) -> str:
-    """
-    Normalize raster images (.png, .jpg, .jpeg) before passing them to detect_colors:
-    - Open with PIL
-    - Convert CMYK/LA/L/Palette/etc. to 3-channel RGB
-    - Save as a temporary PNG and return its path
-    """
-    ext = os.path.splitext(image_path)[1].lower()
-    if ext not in ('.png', '.jpg', '.jpeg'):
-        return image_path
-
-    img = Image.open(image_path)
-
-    # Normalize color modes to 3-channel RGB
-    if img.mode in ('CMYK', 'P'):
-        img = img.convert('RGB')
-    elif img.mode == 'LA':
-        img = img.convert('RGBA').convert('RGB')
-    elif img.mode == 'L':
-        img = img.convert('RGB')
-    elif img.mode == 'RGBA':
-        # Strip alpha but keep RGB channels
-        img = img.convert('RGB')
-
-    rgb_path = os.path.splitext(image_path)[0] + "_rgb.png"
-    img.save(rgb_path, format='PNG')
-    return rgb_path
-
-
-@app.post("/upload")
-async def upload_files(files: List[UploadFile] = File(...)) -> Dict[str, Any]:
-    results = []
-    
-    for file in files:
-        # Save the uploaded file temporarily
-        file_path = f"uploads/{file.filename}"
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-
-        # Determine if this is a PDF/AI/EPS file that needs preprocessing
-        ext = os.path.splitext(file.filename)[1].lower()
-        processed_path = file_path
-        is_pdf = ext == '.pdf'
-        is_ai = ext == '.ai'
-        is_eps = ext in ('.eps', '.epm')
-        if is_pdf:
-            # PDF -> PNG conversion happens here, before the existing pipeline
-            processed_path = _convert_pdf_to_png(file_path)
-        elif is_ai:
-            # AI -> PNG conversion happens here, before the existing pipeline
-            processed_path = _convert_ai_to_png(file_path)
-        elif is_eps:
-            # EPS/EPM -> PNG conversion happens here, before the existing pipeline
-            processed_path = _convert_eps_to_png(file_path)
-        elif ext in ('.png', '.jpg', '.jpeg'):
-            # Raster images (PNG/JPG/JPEG) go directly through the raster loader
-            # before entering the existing detect_colors pipeline.
-            processed_path = _prepare_raster_image_for_detection(file_path)
-        
-        try:
-            # Process the file using the existing color detection pipeline
-            count, colors = detect_colors(processed_path)
-            
-            # Determine MIME type for preview (SVG keeps its type, others use PNG)
-            if ext == '.svg':
-                mime = 'image/svg+xml'
-                preview_path = file_path
-            else:
-                mime = 'image/png'
-                preview_path = processed_path
-
-            # Create preview image
-            with open(preview_path, "rb") as image_file:
-                preview = f"data:{mime};base64," + base64.b64encode(image_file.read()).decode()
-            
-            results.append({
-                "filename": file.filename,
-                "count": count,
-                "colors": list(colors),
-                "preview": preview
-            })
-            
-        except Exception as e:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            if processed_path != file_path and os.path.exists(processed_path):
-                os.remove(processed_path)
-            raise e
-        finally:
-            # Clean up the temporary files
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            if processed_path != file_path and os.path.exists(processed_path):
-                os.remove(processed_path)
-    
-    return {"results": results}
-
-if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+#this code ouptu is in Hexadecimal format
+import os
+import sys
+
+if __name__ == "__main__":
+    # `python app.py` serves this module through uvicorn's module entry point
+    # instead of running it as __main__: spawned pool workers re-import
+    # __main__, and importing this module builds the whole server (FastAPI
+    # app, job store, result cache) that a worker has no use for.
+    os.execv(sys.executable, [
+        sys.executable, "-m", "uvicorn", "app:app", "--host", "0.0.0.0", "--port", "8000",
+        "--app-dir", os.path.dirname(os.path.abspath(__file__)),
+    ])
+
+from fastapi import Depends, FastAPI, UploadFile, File, Query, Request, HTTPException
+from fastapi.responses import FileResponse, HTMLResponse, Response, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+import asyncio
+import hmac
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, List, Literal, Optional
+from fastapi.middleware.cors import CORSMiddleware
+from admission import BodyLimitMiddleware, MemoryBudget, batch_cost
+from cache import ResultCache
+from executor import POOL_WARMUP, DetectionExecutor, FileBatcher
+from jobs import JobManager, JobStore
+import metrics
+import startup
+from profiling import PROFILE_SLOWER_THAN, PROFILERS, list_profiles, profile_path, run_profiled
+from pipeline import RASTER_EXTENSIONS, PageMerger, output_settings, process_batch, process_file, process_page, requested_pages
+
+# Shared process pool for CPU-bound conversion and detection; workers
+# preload the format backends before their first file
+executor = DetectionExecutor(initializer=startup.warm_up)
+# Enables the admin-only endpoints and request profiling when set
+ADMIN_TOKEN = os.environ.get("COLOR_ADMIN_TOKEN") or None
+
+
+async def _run_worker(fn, *args):
+    """
+    executor.run, but with COLOR_PROFILE_SLOWER_THAN set every call runs
+    under the sampling profiler and calls slower than that keep their profile.
+    """
+    if not PROFILE_SLOWER_THAN:
+        return await executor.run(fn, *args)
+    result, _ = await executor.run(run_profiled, "sample", PROFILE_SLOWER_THAN, "slow", fn, *args)
+    return result
+
+
+# Small raster files are detected many per worker call, see process_batch
+batcher = FileBatcher(executor, process_batch, run=_run_worker)
+BATCH_MAX_BYTES = int(os.environ.get("COLOR_BATCH_MAX_BYTES", str(128 * 1024)))
+# Results keyed by file content and detection parameters
+result_cache = ResultCache()
+# Estimated decode memory of the /upload batches in flight
+memory_budget = MemoryBudget()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.import_report = None
+    app.state.workers = []
+    if startup.IMPORT_REPORT:
+        app.state.import_report = await asyncio.to_thread(startup.import_report)
+        print(startup.format_import_report(app.state.import_report), file=sys.stderr)
+    if POOL_WARMUP:
+        app.state.workers = await executor.start(startup.warmup_report)
+    await job_manager.start()
+    yield
+    job_manager.shutdown()
+    executor.shutdown()
+    result_cache.close()
+
+
+app = FastAPI(title="Color Detection API", lifespan=lifespan)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["#your    site name"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+app.add_middleware(BodyLimitMiddleware)
+
+@app.get("/", response_class=HTMLResponse)
+async def get_upload_page():
+    return """
+    <!DOCTYPE html>
+    <html>
+        <head>
+            <title>Color Detection</title>
+            <style>
+                body {
+                    font-family: Arial, sans-serif;
+                    max-width: 1200px;
+                    margin: 0 auto;
+                    padding: 20px;
+                    background-color: #f5f5f5;
+                }
+                .container {
+                    background-color: white;
+                    padding: 20px;
+                    border-radius: 8px;
+                    box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+                }
+                h1 {
+                    color: #333;
+                    text-align: center;
+                }
+                .upload-form {
+                    display: flex;
+                    flex-direction: column;
+                    gap: 20px;
+                    align-items: center;
+                }
+                .file-input {
+                    padding: 10px;
+                    border: 2px dashed #ccc;
+                    border-radius: 4px;
+                    width: 100%;
+                    max-width: 400px;
+                    display: none;
+                }
+                .submit-btn {
+                    background-color: #4CAF50;
+                    color: white;
+                    padding: 10px 20px;
+                    border: none;
+                    border-radius: 4px;
+                    cursor: pointer;
+                    font-size: 16px;
+                }
+                .submit-btn:hover {
+                    background-color: #45a049;
+                }
+                #result {
+                    margin-top: 20px;
+                    padding: 20px;
+                    border-radius: 4px;
+                    display: none;
+                }
+                .color-box {
+                    display: inline-block;
+                    width: 20px;
+                    height: 20px;
+                    margin-right: 5px;
+                    border: 1px solid #ccc;
+                    vertical-align: middle;
+                }
+                .logo-result {
+                    border: 1px solid #ddd;
+                    padding: 20px;
+                    margin: 20px 0;
+                    border-radius: 8px;
+                    background-color: white;
+                }
+                .logo-preview {
+                    max-width: 200px;
+                    max-height: 200px;
+                    margin: 10px 0;
+                }
+                .colors-grid {
+                    display: grid;
+                    grid-template-columns: repeat(auto-fill, minmax(150px, 1fr));
+                    gap: 10px;
+                    margin-top: 10px;
+                }
+                .color-item {
+                    display: flex;
+                    align-items: center;
+                    gap: 5px;
+                }
+                .drop-zone {
+                    border: 2px dashed #ccc;
+                    padding: 20px;
+                    text-align: center;
+                    border-radius: 4px;
+                    cursor: pointer;
+                    transition: border-color 0.3s ease;
+                }
+                .drop-zone:hover {
+                    border-color: #4CAF50;
+                }
+                .drop-zone.dragover {
+                    border-color: #4CAF50;
+                    background-color: #f0f9f0;
+                }
+                .error {
+                    color: #c62828;
+                }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <h1>Color Detection</h1>
+                <form class="upload-form" id="uploadForm">
+                    <div class="drop-zone" id="dropZone">
+                        <p>Drag and drop up to 100 logo files here or click to select</p>
+                        <input type="file" 
+                               class="file-input"
+                               id="file-input"
+                               accept=".png,.jpg,.jpeg,.svg,.pdf,.ai,.eps,.epm,application/pdf,application/postscript"
+                               multiple>
+                    </div>
+                    <button type="submit" class="submit-btn" id="detectBtn">Detect Colors</button>
+                </form>
+                <div id="loading" style="display:none; text-align:center; margin-top:20px; font-weight:bold; color:#4CAF50;">Uploading and processing files...</div>
+                <div id="result"></div>
+            </div>
+            <script>
+                const dropZone = document.getElementById('dropZone');
+                const fileInput = document.getElementById('file-input');
+                const resultDiv = document.getElementById('result');
+
+                // Drag and drop handlers
+                dropZone.addEventListener('dragover', (e) => {
+                    e.preventDefault();
+                    dropZone.classList.add('dragover');
+                });
+
+                dropZone.addEventListener('dragleave', () => {
+                    dropZone.classList.remove('dragover');
+                });
+
+                dropZone.addEventListener('drop', (e) => {
+                    e.preventDefault();
+                    dropZone.classList.remove('dragover');
+                    fileInput.files = e.dataTransfer.files;
+                });
+
+                dropZone.addEventListener('click', () => {
+                    fileInput.click();
+                });
+
+                document.getElementById('uploadForm').onsubmit = async (e) => {
+                    e.preventDefault();
+                    const detectBtn = document.getElementById('detectBtn');
+                    const loadingDiv = document.getElementById('loading');
+                    detectBtn.disabled = true;
+                    loadingDiv.style.display = 'block';
+                    
+                    if (!fileInput.files.length) {
+                        alert('Please select at least one file');
+                        detectBtn.disabled = false;
+                        loadingDiv.style.display = 'none';
+                        return;
+                    }
+
+                    if (fileInput.files.length > 100) {
+                        alert('Maximum 100 files allowed');
+                        detectBtn.disabled = false;
+                        loadingDiv.style.display = 'none';
+                        return;
+                    }
+
+                    const formData = new FormData();
+                    for (let file of fileInput.files) {
+                        formData.append('files', file);
+                    }
+
+                    try {
+                        const response = await fetch('/upload', {
+                            method: 'POST',
+                            headers: { 'Accept': 'application/x-ndjson' },
+                            body: formData
+                        });
+                        if (!response.ok) {
+                            throw new Error(`Upload failed with status ${response.status}`);
+                        }
+
+                        // One placeholder per file, filled in as results stream back
+                        resultDiv.innerHTML = '<h2>Results:</h2>';
+                        const slots = Array.from(fileInput.files, file => {
+                            const slot = document.createElement('div');
+                            slot.className = 'logo-result';
+                            slot.innerHTML = `<h3>${file.name}</h3><p>Processing...</p>`;
+                            resultDiv.appendChild(slot);
+                            return slot;
+                        });
+                        resultDiv.style.display = 'block';
+
+                        const renderResult = (result) => {
+                            const slot = slots[result.index];
+                            if (result.error) {
+                                slot.innerHTML = `
+                                    <h3>${result.filename}</h3>
+                                    <p class="error">Error: ${result.error}</p>
+                                `;
+                                return;
+                            }
+                            slot.innerHTML = `
+                                <h3>${result.filename}</h3>
+                                ${result.preview ? `<img src="${result.preview}" class="logo-preview" alt="${result.filename}">` : ''}
+                                <p>Total Colors Detected: ${result.count}</p>
+                                <div class="colors-grid">
+                                    ${result.colors.map(color => `
+                                        <div class="color-item">
+                                            <span class="color-box" style="background-color: ${color}"></span>
+                                            <span>${color}</span>
+                                        </div>
+                                    `).join('')}
+                                </div>
+                            `;
+                        };
+
+                        const reader = response.body.getReader();
+                        const decoder = new TextDecoder();
+                        let buffered = '';
+                        while (true) {
+                            const { value, done } = await reader.read();
+                            if (done) break;
+                            buffered += decoder.decode(value, { stream: true });
+                            const lines = buffered.split('\\n');
+                            buffered = lines.pop();
+                            lines.filter(line => line.trim()).forEach(line => renderResult(JSON.parse(line)));
+                        }
+                        if (buffered.trim()) {
+                            renderResult(JSON.parse(buffered));
+                        }
+                    } catch (error) {
+                        alert('Error uploading files');
+                        console.error(error);
+                    } finally {
+                        detectBtn.disabled = false;
+                        loadingDiv.style.display = 'none';
+                    }
+                };
+            </script>
+        </body>
+    </html>
+    """
+
+def _cache_key(filename: str, content: bytes, options: Dict[str, Any]) -> str:
+    ext = os.path.splitext(filename)[1].lower()
+    return result_cache.key(content, dict(options, ext=ext, **output_settings()))
+
+
+async def _process_cached(
+    key: str,
+    filename: str,
+    content: bytes,
+    options: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Return the cached result for `key` or compute it in the worker pool.
+    Raster files up to BATCH_MAX_BYTES go through the batcher, so the
+    small files of a batch share worker calls and clustering.
+    The result carries its stage timings in "timings"; those are recorded
+    as metrics but never cached, so a hit only reports the lookup time.
+    """
+    start = time.perf_counter()
+    result = await result_cache.get(key)
+    if result is not None:
+        return dict(result, timings={"cache": time.perf_counter() - start})
+    ext = os.path.splitext(filename)[1].lower()
+    total = 1
+    if options.get("pages", 1) != 1:
+        # Counting pages opens the document with PyMuPDF, which belongs in a worker
+        total = await _run_worker(requested_pages, filename, content, options)
+    if total > 1:
+        result = await _process_pages(filename, content, options, total)
+    elif ext in RASTER_EXTENSIONS and len(content) <= BATCH_MAX_BYTES:
+        result = await batcher.run(filename, content, options)
+    else:
+        result = await _run_worker(process_file, filename, content, options)
+    timings = result.pop("timings", {})
+    metrics.record_timings(os.path.splitext(filename)[1], timings, result.pop("backend", None))
+    await result_cache.put(key, result)
+    return dict(result, timings=timings)
+
+
+async def _process_pages(filename: str, content: bytes, options: Dict[str, Any], total: int) -> Dict[str, Any]:
+    """
+    Spread the pages of a PDF-based file over the worker pool, each worker
+    opening the document on its own. With "stable_pages" the pages go out
+    in waves of one per worker so later waves are skipped once the merged
+    palette has stabilized.
+    """
+    wave_size = executor.workers if options.get("stable_pages") else total
+    merger = PageMerger(filename, options, total)
+    for start in range(0, total, wave_size):
+        wave = range(start, min(total, start + wave_size))
+        page_results = await asyncio.gather(
+            *(_run_worker(process_page, filename, content, page_index, options) for page_index in wave)
+        )
+        if any(merger.add(page) for page in page_results):
+            break
+    return merger.result()
+
+
+async def _process_profiled(filename: str, content: bytes, options: Dict[str, Any], profiler: str) -> Dict[str, Any]:
+    """
+    Process one file in a single worker call under `profiler`, bypassing the
+    cache and the batcher so the profile covers the real work. The result
+    gains "profile": the saved profile's id and its top functions.
+    """
+    result, profile = await executor.run(run_profiled, profiler, 0.0, "request", process_file, filename, content, options)
+    timings = result.pop("timings", {})
+    metrics.record_timings(os.path.splitext(filename)[1], timings, result.pop("backend", None))
+    return dict(result, timings=timings, profile=profile)
+
+
+async def _process_job_file(filename: str, content: bytes, options: Dict[str, Any]) -> Dict[str, Any]:
+    ext = os.path.splitext(filename)[1]
+    metrics.record_file(ext, len(content))
+    try:
+        result = await _process_cached(_cache_key(filename, content, options), filename, content, options)
+    except Exception:
+        metrics.record_failure(ext)
+        raise
+    result.pop("timings", None)
+    return result
+
+
+# Persistent asynchronous jobs, processed through the same cache and pool
+job_manager = JobManager(JobStore(), _process_job_file)
+
+
+async def _iter_batch(
+    items: List[tuple],
+    options: Dict[str, Any],
+    timings: bool = False,
+    read_seconds: Optional[List[float]] = None,
+    profiler: Optional[str] = None,
+) -> AsyncIterator[tuple]:
+    """
+    Process (filename, content) pairs through the cache and the worker pool,
+    yielding (index, result) as soon as each file is done. Identical files
+    within the batch are computed once. A file that fails yields a result
+    with an "error" message instead of aborting the rest of the batch.
+    With `timings`, each successful result keeps its per-stage seconds in
+    "timings", including the upload read time from `read_seconds`.
+    With `profiler`, every file is profiled, see _process_profiled.
+    """
+    tasks: Dict[str, asyncio.Future] = {}
+    positions: Dict[str, List[int]] = {}
+    for index, (filename, content) in enumerate(items):
+        metrics.record_file(os.path.splitext(filename)[1], len(content))
+        key = _cache_key(filename, content, options)
+        if key in tasks:
+            result_cache.batch_duplicates += 1
+        elif profiler:
+            tasks[key] = asyncio.ensure_future(_process_profiled(filename, content, options, profiler))
+        else:
+            tasks[key] = asyncio.ensure_future(_process_cached(key, filename, content, options))
+        positions.setdefault(key, []).append(index)
+
+    keys = {task: key for key, task in tasks.items()}
+    pending = set(tasks.values())
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                for index in positions[keys[task]]:
+                    result = _task_result(task, items[index][0])
+                    stages = result.pop("timings", None)
+                    if timings and stages is not None:
+                        if read_seconds is not None:
+                            stages = dict(stages, read=read_seconds[index])
+                        result["timings"] = stages
+                    yield index, result
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+
+def _task_result(task: asyncio.Future, filename: str) -> Dict[str, Any]:
+    error = task.exception()
+    if error is None:
+        return dict(task.result(), filename=filename)
+    metrics.record_failure(os.path.splitext(filename)[1])
+    if isinstance(error, asyncio.TimeoutError):
+        message = "Processing timed out"
+    else:
+        message = str(error) or type(error).__name__
+    return {"filename": filename, "error": message}
+
+
+async def _stream_batch(
+    items: List[tuple],
+    options: Dict[str, Any],
+    sse: bool,
+    timings: bool = False,
+    read_seconds: Optional[List[float]] = None,
+    profiler: Optional[str] = None,
+) -> AsyncIterator[str]:
+    async for index, result in _iter_batch(items, options, timings, read_seconds, profiler):
+        line = json.dumps(dict(result, index=index))
+        yield f"data: {line}\n\n" if sse else line + "\n"
+
+
+async def _release_after(stream: AsyncIterator[str], cost: int) -> AsyncIterator[str]:
+    """Hold the batch's memory budget until its stream ends or the client goes away."""
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        await memory_budget.release(cost)
+
+
+def _require_admin(request: Request) -> None:
+    """403 unless COLOR_ADMIN_TOKEN is set and the request sends it in X-Admin-Token."""
+    token = request.headers.get("x-admin-token", "")
+    if ADMIN_TOKEN is None or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+def _requested_profiler(request: Request, profile: Optional[str]) -> Optional[str]:
+    """The profiler asked for by the `profile` query parameter or the X-Profile header."""
+    profiler = profile or request.headers.get("x-profile") or None
+    if profiler is None:
+        return None
+    if profiler not in PROFILERS:
+        raise HTTPException(status_code=400, detail=f"Unknown profiler: {profiler}")
+    _require_admin(request)
+    return profiler
+
+
+def detection_options(
+    engine: Literal["kmeans", "histogram"] = Query("kmeans"),
+    sample: Optional[Literal["stride", "random", "stratified"]] = Query(None),
+    max_pixels: int = Query(250_000, gt=0),
+    min_share: float = Query(0.001, ge=0, le=1),
+    n_colors: str = Query("5", pattern=r"^(auto|[1-9][0-9]?)$"),
+    pages: int = Query(1, ge=0),
+    stable_pages: int = Query(0, ge=0),
+    preview: Literal["none", "thumb", "full"] = Query("thumb"),
+    mode: Literal["raster", "vector"] = Query("raster"),
+) -> Dict[str, Any]:
+    """The detection and pipeline options shared by /upload and /jobs, also used in cache keys."""
+    return {
+        "engine": engine,
+        "sample": sample,
+        "max_pixels": max_pixels,
+        "min_share": min_share,
+        "n_colors": n_colors if n_colors == "auto" else int(n_colors),
+        "pages": pages,
+        "stable_pages": stable_pages,
+        "preview": preview,
+        "mode": mode,
+    }
+
+
+@app.post("/upload")
+async def upload_files(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    options: Dict[str, Any] = Depends(detection_options),
+    timings: bool = Query(False),
+    profile: Optional[Literal["cprofile", "sample"]] = Query(None),
+):
+    """
+    Detect colors in a batch of files. By default the full batch is returned
+    as one JSON document in upload order. Clients sending
+    `Accept: application/x-ndjson` or `Accept: text/event-stream` instead get
+    one JSON object per file, with its upload `index`, as soon as it is done.
+    With `timings=true` each result also lists the seconds spent per stage.
+    Admission control:
+    - Bodies over COLOR_MAX_REQUEST_BYTES and files over COLOR_MAX_FILE_BYTES
+      are rejected with 413 while they stream in
+    - The batch waits for room in the memory budget (its estimated decoded
+      pixel memory) and gets 429 with Retry-After if none frees up in time
+    Admins (X-Admin-Token) can profile the request with `profile` or the
+    X-Profile header: "cprofile" or "sample". Each file then skips the cache
+    and its result lists the saved profile's id and top functions.
+    """
+    profiler = _requested_profiler(request, profile)
+    cost = batch_cost(files, options, executor.workers)
+    await memory_budget.acquire(cost)
+    streaming = False
+    try:
+        items = []
+        read_seconds = []
+        for file in files:
+            start = time.perf_counter()
+            content = await file.read()
+            elapsed = time.perf_counter() - start
+            metrics.record_timings(os.path.splitext(file.filename)[1], {"read": elapsed})
+            items.append((file.filename, content))
+            read_seconds.append(elapsed)
+
+        accept = request.headers.get("accept", "")
+        for media_type in ("text/event-stream", "application/x-ndjson"):
+            if media_type in accept:
+                stream = _stream_batch(
+                    items, options, media_type == "text/event-stream", timings, read_seconds, profiler
+                )
+                streaming = True
+                return StreamingResponse(_release_after(stream, cost), media_type=media_type)
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        async for index, result in _iter_batch(items, options, timings, read_seconds, profiler):
+            results[index] = result
+        return {"results": results}
+    finally:
+        if not streaming:
+            await memory_budget.release(cost)
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    files: List[UploadFile] = File(...),
+    options: Dict[str, Any] = Depends(detection_options),
+    concurrency: int = Query(4, ge=1),
+) -> Dict[str, Any]:
+    """
+    Queue a batch for background processing and return its job id at once.
+    - Accepts the same options as /upload
+    - `concurrency` caps how many of the job's files run at the same time
+      (bounded by COLOR_JOB_MAX_CONCURRENCY)
+    - Jobs and their uploads are persisted, so unfinished jobs resume after a restart
+    - The same request and per-file size limits as /upload apply; the memory
+      budget doesn't, since the files are processed later at `concurrency`
+    """
+    items = [(file.filename, await file.read()) for file in files]
+    job_id = await job_manager.submit(items, options, concurrency)
+    return {"job_id": job_id, "status": "queued", "total": len(items)}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=60)) -> Dict[str, Any]:
+    """
+    Job status, progress and the per-file results finished so far.
+    With `wait` > 0 the request long-polls until the job finishes or
+    `wait` seconds pass.
+    """
+    job = await job_manager.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str) -> Dict[str, Any]:
+    """Cancel a job; files that already finished keep their results."""
+    job = await job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/metrics")
+async def prometheus_metrics() -> Response:
+    """Prometheus metrics: stage latency histograms and file/byte/failure counters."""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/cache/stats")
+async def cache_stats() -> Dict[str, Any]:
+    return result_cache.stats()
+
+
+@app.get("/profiles")
+async def get_profiles(request: Request) -> Dict[str, Any]:
+    """Saved profiles, newest first: requested ones and those caught by COLOR_PROFILE_SLOWER_THAN."""
+    _require_admin(request)
+    return {"profiles": list_profiles()}
+
+
+@app.get("/profiles/{profile_id}")
+async def download_profile(request: Request, profile_id: str) -> FileResponse:
+    """Download a profile: pstats for "cprofile", speedscope JSON for "sample"."""
+    _require_admin(request)
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=os.path.basename(path))
+
+
+@app.get("/diagnostics/startup")
+async def startup_diagnostics() -> Dict[str, Any]:
+    """
+    Worker warm-up seconds per backend (from the pool start) and, with
+    COLOR_IMPORT_REPORT=1, the slowest imports of the app.
+    """
+    return {"workers": app.state.workers, "imports": app.state.import_report}
+
+
+@app.get("/admission/stats")
+async def admission_stats() -> Dict[str, Any]:
+    """Memory budget capacity, the bytes reserved by running batches and 429s so far."""
+    return memory_budget.stats()
+ 
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+Deterministic synthetic asset corpus for the benchmarks.
+
+Every asset is generated in memory from a fixed seed, so two runs on any
+machine measure exactly the same bytes and no network or sample files
+are needed.
+"""
+import random
+from io import BytesIO
+from typing import List, NamedTuple
+
+import fitz  # PyMuPDF for PDF generation
+from PIL import Image, ImageDraw
+
+from benchmarks.svg import make_svg
+
+RASTER_SIZES = (256, 1024, 2048)
+SVG_ELEMENTS = (10, 1000, 10000, 100000)
+PDF_PAGES = 4
+QUICK_RASTER_SIZES = (256, 1024)
+QUICK_SVG_ELEMENTS = (10, 1000)
+
+
+class Asset(NamedTuple):
+    name: str  # benchmark group, e.g. "png-1024-rgba"
+    filename: str
+    content: bytes
+
+
+def _palette(rng: random.Random, n: int) -> List[tuple]:
+    return [(rng.randrange(256), rng.randrange(256), rng.randrange(256)) for _ in range(n)]
+
+
+def make_logo(size: int, alpha: bool, seed: int = 0) -> Image.Image:
+    """
+    Draw a logo-like image: a handful of flat brand colors in overlapping
+    anti-aliased shapes and text-like bars, on a transparent or white
+    background.
+    """
+    rng = random.Random(seed)
+    colors = _palette(rng, 6)
+    # Draw at 2x and downsample so edges carry blended colors like real exports
+    canvas = size * 2
+    background = (0, 0, 0, 0) if alpha else (255, 255, 255, 255)
+    image = Image.new("RGBA", (canvas, canvas), background)
+    draw = ImageDraw.Draw(image)
+    for i in range(24):
+        x0, y0 = rng.randrange(canvas), rng.randrange(canvas)
+        x1 = min(canvas, x0 + rng.randrange(canvas // 16, canvas // 3))
+        y1 = min(canvas, y0 + rng.randrange(canvas // 16, canvas // 3))
+        fill = colors[i % len(colors)] + (255,)
+        if i % 3 == 0:
+            draw.ellipse((x0, y0, x1, y1), fill=fill)
+        elif i % 3 == 1:
+            draw.rectangle((x0, y0, x1, y1), fill=fill)
+        else:
+            draw.rectangle((x0, y0, x1, y0 + max(2, canvas // 64)), fill=fill)
+    image = image.resize((size, size), Image.LANCZOS)
+    return image if alpha else image.convert("RGB")
+
+
+def make_raster(size: int, fmt: str, alpha: bool, seed: int = 0) -> bytes:
+    image = make_logo(size, alpha, seed)
+    buffer = BytesIO()
+    if fmt == "jpeg":
+        image.convert("RGB").save(buffer, "JPEG", quality=90)
+    else:
+        image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def make_pdf(pages: int, seed: int = 0) -> bytes:
+    """A multi-page PDF with filled and stroked vector shapes, text and an embedded image per page."""
+    rng = random.Random(seed)
+    colors = _palette(rng, 8)
+    doc = fitz.open()
+    for page_number in range(pages):
+        page = doc.new_page(width=612, height=792)
+        for i in range(40):
+            x, y = rng.uniform(20, 520), rng.uniform(20, 700)
+            rect = fitz.Rect(x, y, x + rng.uniform(10, 80), y + rng.uniform(10, 80))
+            color = tuple(c / 255 for c in colors[(i + page_number) % len(colors)])
+            if i % 2:
+                page.draw_rect(rect, color=None, fill=color)
+            else:
+                page.draw_circle(rect.tl, rect.width / 2, color=color, fill=None, width=2)
+        page.insert_text((40, 760), f"Page {page_number + 1}", color=tuple(c / 255 for c in colors[0]), fontsize=18)
+        image = BytesIO()
+        make_logo(128, alpha=False, seed=seed + page_number).save(image, "PNG")
+        page.insert_image(fitz.Rect(400, 600, 528, 728), stream=image.getvalue())
+    content = doc.tobytes()
+    doc.close()
+    return content
+
+
+def make_eps(shapes: int = 60, seed: int = 0) -> bytes:
+    """A plain PostScript EPS with filled rectangles and arcs."""
+    rng = random.Random(seed)
+    colors = _palette(rng, 8)
+    lines = [
+        "%!PS-Adobe-3.0 EPSF-3.0",
+        "%%BoundingBox: 0 0 400 400",
+        "%%EndComments",
+    ]
+    for i in range(shapes):
+        r, g, b = (c / 255 for c in colors[i % len(colors)])
+        x, y = rng.randrange(360), rng.randrange(360)
+        lines.append(f"{r:.3f} {g:.3f} {b:.3f} setrgbcolor")
+        if i % 2:
+            lines.append(f"newpath {x} {y} {rng.randrange(5, 30)} 0 360 arc fill")
+        else:
+            lines.append(f"{x} {y} {rng.randrange(5, 40)} {rng.randrange(5, 40)} rectfill")
+    lines += ["showpage", "%%EOF"]
+    return "\n".join(lines).encode()
+
+
+def build_corpus(seed: int = 0, quick: bool = False) -> List[Asset]:
+    """Generate the full corpus, or a smaller one for quick checks."""
+    raster_sizes = QUICK_RASTER_SIZES if quick else RASTER_SIZES
+    svg_elements = QUICK_SVG_ELEMENTS if quick else SVG_ELEMENTS
+    assets = []
+    for size in raster_sizes:
+        assets.append(Asset(f"png-{size}-rgb", f"logo-{size}.png", make_raster(size, "png", False, seed)))
+        assets.append(Asset(f"png-{size}-rgba", f"logo-{size}-alpha.png", make_raster(size, "png", True, seed)))
+        assets.append(Asset(f"jpeg-{size}", f"logo-{size}.jpg", make_raster(size, "jpeg", False, seed)))
+    for n in svg_elements:
+        assets.append(Asset(f"svg-{n}", f"shapes-{n}.svg", make_svg(n, seed)))
+    assets.append(Asset(f"pdf-{PDF_PAGES}p", "document.pdf", make_pdf(PDF_PAGES, seed)))
+    assets.append(Asset("eps", "artwork.eps", make_eps(seed=seed)))
+    return assets
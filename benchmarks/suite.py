@@ -0,0 +1,187 @@
+"""
+Time every pipeline stage on the synthetic corpus and track regressions.
+
+    python -m benchmarks.suite --save baseline.json
+    python -m benchmarks.suite --compare baseline.json --threshold 0.25
+
+Each corpus group runs in a fresh worker process so its peak RSS is its
+own. Stages are timed separately (decode/render, detect, preview) and
+end to end through process_file; the report lists p50/p95 latency per
+stage, throughput and peak RSS.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.corpus import Asset, build_corpus
+
+# Stage p50s that grew by less than this many seconds are treated as noise
+MIN_REGRESSION_SECONDS = 0.002
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _stages(asset: Asset, options: Dict[str, Any]) -> Dict[str, Callable[[], Any]]:
+    """The stage callables for one asset, each fed the output of the previous stage."""
+    from color_detection import detect_colors, extract_pdf_colors
+    from converters import render_vector
+    from pipeline import VECTOR_EXTENSIONS, _build_preview, _decode_raster_image, process_file
+
+    ext = os.path.splitext(asset.filename)[1].lower()
+    content = asset.content
+    stages: Dict[str, Callable[[], Any]] = {}
+    if ext == ".svg":
+        source = content
+    elif ext in VECTOR_EXTENSIONS:
+        source = render_vector(content)
+        stages["render"] = lambda: render_vector(content)
+        if ext == ".pdf":
+            stages["vector_extract"] = lambda: extract_pdf_colors(content, **options)
+    else:
+        source = _decode_raster_image(content)
+        stages["decode"] = lambda: _decode_raster_image(content)
+    stages["detect"] = lambda: detect_colors(source, ext=ext, **options)
+    stages["preview"] = lambda: _build_preview(ext, content, source, "thumb")
+    stages["total"] = lambda: process_file(asset.filename, content, dict(options, preview="thumb"))
+    return stages
+
+
+def bench_asset(asset: Asset, options: Dict[str, Any], repeat: int) -> Dict[str, Any]:
+    """Worker entry point: measure one corpus group."""
+    result: Dict[str, Any] = {"bytes": len(asset.content)}
+    start_rss = _peak_rss_mb()
+    try:
+        stages = _stages(asset, options)
+        # One untimed pass so lazy imports and caches don't skew the first sample
+        for fn in stages.values():
+            fn()
+    except Exception as e:
+        result["error"] = str(e) or type(e).__name__
+        return result
+
+    for name, fn in stages.items():
+        timings = _time(fn, repeat)
+        result[name] = {
+            "p50": float(np.percentile(timings, 50)),
+            "p95": float(np.percentile(timings, 95)),
+            "mean": float(np.mean(timings)),
+        }
+    total = result["total"]["p50"]
+    result["files_per_second"] = 1 / total if total else 0.0
+    result["mb_per_second"] = len(asset.content) / total / 1e6 if total else 0.0
+    result["peak_rss_mb"] = _peak_rss_mb()
+    result["rss_growth_mb"] = result["peak_rss_mb"] - start_rss
+    return result
+
+
+def _bench_asset_args(args: tuple) -> Dict[str, Any]:
+    return bench_asset(*args)
+
+
+def run(assets: List[Asset], options: Dict[str, Any], repeat: int) -> Dict[str, Any]:
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        measured = pool.map(_bench_asset_args, [(asset, options, repeat) for asset in assets], chunksize=1)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "options": options,
+        },
+        "results": {asset.name: result for asset, result in zip(assets, measured)},
+    }
+
+
+def report(results: Dict[str, Any]) -> None:
+    print(f"{'group':<18} {'stage':<15} {'p50 (ms)':>10} {'p95 (ms)':>10} {'files/s':>9} {'MB/s':>8} {'peak RSS':>9}")
+    for group, result in results["results"].items():
+        if "error" in result:
+            print(f"{group:<18} skipped: {result['error']}")
+            continue
+        stages = [name for name, value in result.items() if isinstance(value, dict)]
+        for i, stage in enumerate(stages):
+            timing = result[stage]
+            line = f"{group if i == 0 else '':<18} {stage:<15} {timing['p50'] * 1000:>10.2f} {timing['p95'] * 1000:>10.2f}"
+            if stage == "total":
+                line += f" {result['files_per_second']:>9.1f} {result['mb_per_second']:>8.2f} {result['peak_rss_mb']:>7.0f}MB"
+            print(line)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Describe every stage p50 or peak RSS that grew by more than `threshold` (a fraction)."""
+    regressions = []
+    for group, old in baseline["results"].items():
+        new = results["results"].get(group)
+        if new is None or "error" in new or "error" in old:
+            continue
+        for stage, old_timing in old.items():
+            if not isinstance(old_timing, dict) or stage not in new:
+                continue
+            before, after = old_timing["p50"], new[stage]["p50"]
+            if after > before * (1 + threshold) and after - before > MIN_REGRESSION_SECONDS:
+                regressions.append(f"{group} {stage}: p50 {before * 1000:.2f}ms -> {after * 1000:.2f}ms")
+        if new["peak_rss_mb"] > old["peak_rss_mb"] * (1 + threshold):
+            regressions.append(f"{group}: peak RSS {old['peak_rss_mb']:.0f}MB -> {new['peak_rss_mb']:.0f}MB")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Smaller corpus for a fast check")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", choices=("kmeans", "histogram"), default="kmeans")
+    parser.add_argument("--groups", nargs="+", help="Only run groups whose name starts with one of these prefixes")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before failing (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    assets = build_corpus(args.seed, args.quick)
+    if args.groups:
+        assets = [asset for asset in assets if asset.name.startswith(tuple(args.groups))]
+    results = run(assets, {"engine": args.engine}, args.repeat)
+    results["meta"]["seed"] = args.seed
+    report(results)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
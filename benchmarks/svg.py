@@ -0,0 +1,81 @@
+"""
+Compare the SVG extractor engines on synthetic documents.
+
+    python -m benchmarks.svg --elements 1000 10000 100000
+"""
+import argparse
+import random
+import time
+
+from color_detection import extract_svg_colors, SVG_ENGINES
+
+
+def make_svg(n_elements: int, seed: int = 0) -> bytes:
+    """
+    Build a deterministic SVG with n_elements shapes spread over nested
+    groups, mixing fill/stroke attributes, inline styles, rgb() colors and
+    gradients, like exported maps and icon sprites.
+    """
+    rng = random.Random(seed)
+    palette = ['#%06X' % rng.randrange(0x1000000) for _ in range(48)]
+    parts = [
+        '<svg xmlns="http://www.w3.org/2000/svg" width="1000" height="1000">',
+        '<defs>',
+    ]
+    for i in range(8):
+        parts.append(
+            f'<linearGradient id="g{i}"><stop offset="0" stop-color="{palette[i]}"/>'
+            f'<stop offset="1" style="stop-color:{palette[i + 8]};stop-opacity:1"/></linearGradient>'
+        )
+    parts.append('</defs>')
+    for i in range(n_elements):
+        if i % 50 == 0:
+            if i:
+                parts.append('</g>')
+            parts.append(f'<g id="layer{i // 50}" stroke="{rng.choice(palette)}">')
+        x, y = rng.randrange(1000), rng.randrange(1000)
+        kind = i % 4
+        if kind == 0:
+            parts.append(f'<rect x="{x}" y="{y}" width="5" height="5" fill="{rng.choice(palette)}"/>')
+        elif kind == 1:
+            parts.append(f'<path d="M{x} {y}l5 5" style="fill:none;stroke:{rng.choice(palette)};stroke-width:1"/>')
+        elif kind == 2:
+            r, g, b = (rng.randrange(256) for _ in range(3))
+            parts.append(f'<circle cx="{x}" cy="{y}" r="3" fill="rgb({r}, {g}, {b})"/>')
+        else:
+            parts.append(f'<circle cx="{x}" cy="{y}" r="3" fill="url(#g{rng.randrange(8)})"/>')
+    if n_elements:
+        parts.append('</g>')
+    parts.append('</svg>')
+    return '\n'.join(parts).encode()
+
+
+def run(sizes, repeat: int = 3) -> None:
+    print(f"{'elements':>10} " + " ".join(f"{engine + ' (s)':>12}" for engine in SVG_ENGINES) + f" {'speedup':>8}")
+    for size in sizes:
+        svg = make_svg(size)
+        timings = {}
+        outputs = {}
+        for engine in SVG_ENGINES:
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                outputs[engine] = extract_svg_colors(svg, engine=engine)
+                best = min(best, time.perf_counter() - start)
+            timings[engine] = best
+        if len({frozenset(colors) for _, colors in outputs.values()}) != 1:
+            raise AssertionError(f"Engines disagree on the {size}-element document")
+        speedup = timings["soup"] / timings["lxml"]
+        print(f"{size:>10} " + " ".join(f"{timings[engine]:>12.4f}" for engine in SVG_ENGINES) + f" {speedup:>7.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--elements", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.elements, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
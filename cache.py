@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Cache sizing, overridable through the environment
+CACHE_MEMORY_BYTES = int(os.environ.get("COLOR_CACHE_MEMORY_BYTES", str(256 * 1024 * 1024)))
+# Path of the persistent SQLite tier; unset disables it
+CACHE_DB_PATH = os.environ.get("COLOR_CACHE_DB") or None
+CACHE_DB_BYTES = int(os.environ.get("COLOR_CACHE_DB_BYTES", str(1024 * 1024 * 1024)))
+# Bump when the result format or detection behaviour changes
+CACHE_VERSION = 7
+
+
+class ResultCache:
+    """
+    Two-tier cache of detection results keyed by file content and parameters:
+    - An in-memory LRU bounded by the serialized size of its entries
+    - An optional SQLite store that evicts least recently used rows
+      once the stored results exceed `db_max_bytes`
+    Hits from the SQLite tier are promoted into memory. SQLite calls run in
+    a thread, serialized by a lock, so disk lookups and writes never stall
+    the event loop; the stored bytes are tracked as a running total.
+    """
+
+    def __init__(
+        self,
+        memory_bytes: int = CACHE_MEMORY_BYTES,
+        db_path: Optional[str] = CACHE_DB_PATH,
+        db_max_bytes: int = CACHE_DB_BYTES,
+    ):
+        self.memory_bytes = memory_bytes
+        self.db_max_bytes = db_max_bytes
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._memory_size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # Files computed once and shared with an identical file in the same batch
+        self.batch_duplicates = 0
+        self._db = None
+        self._lock = threading.Lock()
+        self._db_entries = 0
+        self._db_size = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            self._db.commit()
+            self._db_entries, self._db_size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+
+    @staticmethod
+    def key(content: bytes, params: Dict[str, Any]) -> str:
+        """SHA-256 of the file bytes combined with the detection parameters."""
+        digest = hashlib.sha256(content).hexdigest()
+        params = dict(params, cache_version=CACHE_VERSION)
+        return digest + ":" + json.dumps(params, sort_keys=True)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return dict(entry[0])
+        if self._db is not None:
+            serialized = await asyncio.to_thread(self._db_get, key)
+            if serialized is not None:
+                value = json.loads(serialized)
+                self._remember(key, value, len(serialized))
+                self.hits += 1
+                self.disk_hits += 1
+                return dict(value)
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, value: Dict[str, Any]) -> None:
+        serialized = json.dumps(value)
+        self._remember(key, value, len(serialized))
+        if self._db is not None:
+            await asyncio.to_thread(self._db_put, key, serialized)
+
+    def _db_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return row[0]
+
+    def _db_put(self, key: str, serialized: str) -> None:
+        with self._lock:
+            old = self._db.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self._db_entries -= 1
+                self._db_size -= old[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, serialized, len(serialized), time.time()),
+            )
+            self._db_entries += 1
+            self._db_size += len(serialized)
+            self._evict_db()
+            self._db.commit()
+
+    def _remember(self, key: str, value: Dict[str, Any], size: int) -> None:
+        if size > self.memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= old[1]
+        self._memory[key] = (value, size)
+        self._memory_size += size
+        while self._memory_size > self.memory_bytes:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_size -= evicted_size
+
+    def _evict_db(self) -> None:
+        while self._db_size > self.db_max_bytes:
+            row = self._db.execute("SELECT key, size FROM results ORDER BY accessed LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM results WHERE key = ?", (row[0],))
+            self._db_entries -= 1
+            self._db_size -= row[1]
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "batch_duplicates": self.batch_duplicates,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+        }
+        if self._db is not None:
+            stats["disk_entries"] = self._db_entries
+            stats["disk_bytes"] = self._db_size
+        return stats
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,268 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterable, Iterator, List, Set
+
+from color_detection import RASTER_EXTENSIONS
+from executor import FILE_TIMEOUT, POOL_MAX_TASKS_PER_CHILD, POOL_WORKERS, kill_pool
+from pipeline import VECTOR_EXTENSIONS, process_file
+
+SUPPORTED_EXTENSIONS = RASTER_EXTENSIONS + ('.svg',) + VECTOR_EXTENSIONS
+# Files submitted ahead of the workers, per worker, so huge trees are never
+# turned into one future per file up front
+QUEUE_DEPTH = 4
+
+
+def iter_paths(paths: Iterable[str]) -> Iterator[str]:
+    """Yield supported files from the given files and directory trees, in sorted order."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def read_file_list(list_path: str) -> Iterator[str]:
+    """Yield one path per non-empty line of `list_path` ("-" reads stdin)."""
+    stream = sys.stdin if list_path == "-" else open(list_path, encoding="utf-8")
+    try:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield line
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def completed_paths(output_path: str) -> Set[str]:
+    """Paths already recorded in an existing JSONL output, for resuming."""
+    done: Set[str] = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as output:
+        for line in output:
+            try:
+                done.add(json.loads(line)["path"])
+            except (ValueError, KeyError, TypeError):
+                # A line cut short by an interrupted run is simply redone
+                continue
+    return done
+
+
+def detect_path(path: str, options: Dict[str, Any], timings: bool = False) -> Dict[str, Any]:
+    """Worker entry point: read one file and run the shared pipeline on it."""
+    try:
+        with open(path, "rb") as file:
+            content = file.read()
+        result = process_file(os.path.basename(path), content, options)
+    except Exception as e:
+        return {"path": path, "error": str(e) or type(e).__name__}
+    result = dict(result, path=path, bytes=len(content))
+    result.pop("filename", None)
+    result.pop("backend", None)
+    if not timings:
+        result.pop("timings", None)
+    if result.get("preview") is None:
+        result.pop("preview", None)
+    return result
+
+
+def run(
+    paths: Iterable[str],
+    output,
+    options: Dict[str, Any],
+    workers: int,
+    skip: Set[str],
+    timings: bool = False,
+    timeout: float = FILE_TIMEOUT,
+) -> Dict[str, Any]:
+    """
+    Process `paths` across `workers` processes, writing one JSON line per
+    file to `output` as soon as it completes. Paths in `skip` are not
+    processed. With `timings`, each line keeps its per-stage seconds.
+    A file running longer than `timeout` seconds (0 = no limit) or a worker
+    crash (segfault, OOM kill) takes the pool down; the files that were in
+    flight are then rerun one at a time in a fresh pool, so the culprit
+    gets an error line and the rest their results.
+    Returns the run summary.
+    """
+    stats = {"processed": 0, "failed": 0, "skipped": 0, "bytes": 0}
+    started = time.perf_counter()
+    last_progress = started
+    pending: Dict[Future, str] = {}
+    # When each in-flight future was first seen on a worker
+    running_since: Dict[Future, float] = {}
+
+    def new_pool() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=POOL_MAX_TASKS_PER_CHILD or None)
+
+    pool = new_pool()
+
+    def record(result: Dict[str, Any]) -> None:
+        nonlocal last_progress
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+        stats["processed"] += 1
+        stats["failed"] += "error" in result
+        stats["bytes"] += result.get("bytes", 0)
+        now = time.perf_counter()
+        if now - last_progress >= 5:
+            last_progress = now
+            rate = stats["processed"] / (now - started)
+            print(f"{stats['processed']} files, {rate:.1f} files/s", file=sys.stderr)
+
+    def run_isolated(suspects: List[str]) -> None:
+        nonlocal pool
+        for path in suspects:
+            future = pool.submit(detect_path, path, options, timings)
+            try:
+                result = future.result(timeout=timeout or None)
+            except (BrokenProcessPool, FutureTimeoutError) as e:
+                error = "Processing timed out" if isinstance(e, FutureTimeoutError) else "Worker process crashed"
+                result = {"path": path, "error": error}
+                kill_pool(pool)
+                pool = new_pool()
+            record(result)
+
+    def collect(limit: int) -> None:
+        nonlocal pool
+        while len(pending) > limit:
+            done, _ = wait(pending, timeout=1.0 if timeout else None, return_when=FIRST_COMPLETED)
+            now = time.perf_counter()
+            failed = False
+            for future in done:
+                path = pending.pop(future)
+                running_since.pop(future, None)
+                if isinstance(future.exception(), BrokenProcessPool):
+                    pending[future] = path
+                    failed = True
+                else:
+                    record(future.result())
+            # The pool marks one call more than it has workers as running
+            # while it still waits in the queue. Calls start in submission
+            # order, so only the oldest `workers` running ones are on a worker.
+            for future in [future for future in pending if future.running()][:workers]:
+                running_since.setdefault(future, now)
+            if timeout and any(now - since > timeout for since in running_since.values()):
+                failed = True
+            if failed:
+                suspects = list(pending.values())
+                pending.clear()
+                running_since.clear()
+                kill_pool(pool)
+                pool = new_pool()
+                run_isolated(suspects)
+
+    try:
+        for path in paths:
+            if path in skip:
+                stats["skipped"] += 1
+                continue
+            collect(workers * QUEUE_DEPTH - 1)
+            pending[pool.submit(detect_path, path, options, timings)] = path
+        collect(0)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 3)
+    stats["files_per_second"] = round(stats["processed"] / elapsed, 2) if elapsed else 0.0
+    stats["mb_per_second"] = round(stats["bytes"] / elapsed / 1e6, 2) if elapsed else 0.0
+    return stats
+
+
+def _n_colors(value: str):
+    if value == "auto":
+        return value
+    try:
+        n_colors = int(value)
+    except ValueError:
+        n_colors = 0
+    if n_colors < 1:
+        raise argparse.ArgumentTypeError("expected a positive integer or 'auto'")
+    return n_colors
+
+
+def _share(value: str) -> float:
+    try:
+        share = float(value)
+    except ValueError:
+        share = -1.0
+    if not 0 <= share <= 1:
+        raise argparse.ArgumentTypeError("expected a fraction between 0 and 1")
+    return share
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Detect colors in files and directory trees, writing JSONL.")
+    parser.add_argument("paths", nargs="*", help="Files or directories to process")
+    parser.add_argument("--file-list", help="File with one path per line (- for stdin)")
+    parser.add_argument("-o", "--output", help="JSONL output file; existing entries are skipped (default: stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=POOL_WORKERS)
+    parser.add_argument("--engine", choices=("kmeans", "histogram"), default="kmeans")
+    parser.add_argument("--sample", choices=("stride", "random", "stratified"))
+    parser.add_argument("--max-pixels", type=int, default=250_000)
+    parser.add_argument("--min-share", type=_share, default=0.001,
+                        help="With --sample, keep colors covering at least this share of the image (0 = off)")
+    parser.add_argument("--n-colors", type=_n_colors, default=5, help="Palette size for raster files, or 'auto'")
+    parser.add_argument("--mode", choices=("raster", "vector"), default="raster")
+    parser.add_argument("--pages", type=int, default=1, help="Pages of PDF/AI files to process (0 = all)")
+    parser.add_argument("--stable-pages", type=int, default=0,
+                        help="Stop after this many pages leave the merged palette unchanged (0 = off)")
+    parser.add_argument("--preview", choices=("none", "thumb", "full"), default="none")
+    parser.add_argument("--timings", action="store_true", help="Include per-stage seconds in each line")
+    parser.add_argument("--timeout", type=float, default=FILE_TIMEOUT,
+                        help="Seconds a file may run before it is recorded as failed (0 = no limit)")
+    args = parser.parse_args(argv)
+    if not args.paths and not args.file_list:
+        parser.error("give at least one path or --file-list")
+
+    options = {
+        "engine": args.engine,
+        "sample": args.sample,
+        "max_pixels": args.max_pixels,
+        "min_share": args.min_share,
+        "n_colors": args.n_colors,
+        "pages": args.pages,
+        "stable_pages": args.stable_pages,
+        "preview": args.preview,
+        "mode": args.mode,
+    }
+    sources: Iterable[str] = args.paths
+    if args.file_list:
+        sources = itertools.chain(args.paths, read_file_list(args.file_list))
+    paths = iter_paths(sources)
+
+    if args.output:
+        skip = completed_paths(args.output)
+        with open(args.output, "a+", encoding="utf-8") as output:
+            if output.tell():
+                output.seek(output.tell() - 1)
+                if output.read(1) != "\n":
+                    # Terminate a line cut short by an interrupted run
+                    output.write("\n")
+            stats = run(paths, output, options, max(1, args.workers), skip, args.timings, args.timeout)
+    else:
+        stats = run(paths, sys.stdout, options, max(1, args.workers), set(), args.timings, args.timeout)
+
+    print(
+        f"Processed {stats['processed']} files ({stats['failed']} failed, {stats['skipped']} skipped) "
+        f"in {stats['seconds']:.1f}s: {stats['files_per_second']:.1f} files/s, {stats['mb_per_second']:.2f} MB/s",
+        file=sys.stderr,
+    )
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,135 +1,938 @@
-from PIL import Image
-import numpy as np
-from bs4 import BeautifulSoup
-import os
-import re
-import cv2
-
-def count_png_colors(file_path, n_colors=5):
-    image = Image.open(file_path).convert("RGBA")
-    np_img = np.array(image)
-    # Remove fully transparent pixels
-    pixels = np_img[np_img[:, :, 3] != 0][:, :3]
-    if len(pixels) == 0:
-        return 0, set()
-    # Use OpenCV k-means to find dominant colors
-    Z = pixels.reshape((-1, 3)).astype(np.float32)
-    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1.0)
-    K = min(n_colors, len(Z))
-    _, labels, centers = cv2.kmeans(Z, K, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
-    centers = np.uint8(centers)
-    color_labels = set()
-    for center in centers:
-        if tuple(center) == (255, 255, 255):
-            color_labels.add('white')
-        else:
-            color_labels.add('#{:02X}{:02X}{:02X}'.format(*center))
-    return len(color_labels), color_labels
-
-def extract_svg_colors(file_path):
-    def is_white(color):
-        color = color.strip().lower()
-        if color in ['#fff', '#ffffff', '#FFF', '#FFFFFF', 'white']:
-            return True
-        rgb_match = re.match(r'rgb\s*\(\s*255\s*,\s*255\s*,\s*255\s*\)', color)
-        if rgb_match:
-            return True
-        rgb_pct_match = re.match(r'rgb\s*\(\s*100%\s*,\s*100%\s*,\s*100%\s*\)', color)
-        if rgb_pct_match:
-            return True
-        rgba_match = re.match(r'rgba\s*\(\s*255\s*,\s*255\s*,\s*255\s*,\s*1(\.0*)?\s*\)', color)
-        if rgba_match:
-            return True
-        rgba_pct_match = re.match(r'rgba\s*\(\s*100%\s*,\s*100%\s*,\s*100%\s*,\s*1(\.0*)?\s*\)', color)
-        if rgba_pct_match:
-            return True
-        return False
-
-    def is_visible(tag):
-        style = tag.get('style', '')
-        if 'display:none' in style or 'visibility:hidden' in style or 'opacity:0' in style:
-            return False
-        if tag.get('display') == 'none' or tag.get('visibility') == 'hidden' or tag.get('opacity') == '0':
-            return False
-        return True
-
-    def normalize_color(color):
-        color = color.strip().lower()
-        if is_white(color):
-            return 'white'
-        # Hex color
-        if color.startswith('#'):
-            if len(color) == 4:
-                # e.g. #abc -> #aabbcc
-                color = '#' + ''.join([c*2 for c in color[1:]])
-            return color.upper()
-        # rgb/rgba
-        rgb_match = re.match(r'rgb\s*\(([^)]+)\)', color)
-        if rgb_match:
-            parts = rgb_match.group(1).split(',')
-            if '%' in parts[0]:
-                # rgb(100%,100%,100%)
-                vals = [int(float(p.strip().replace('%','')) * 2.55) for p in parts[:3]]
-            else:
-                vals = [int(float(p.strip())) for p in parts[:3]]
-            return '#{:02X}{:02X}{:02X}'.format(*vals)
-        # named color
-        return color
-
-    with open(file_path, 'r', encoding='utf-8') as file:
-        soup = BeautifulSoup(file.read(), 'xml')
-    colors = set()
-    # 1. Extract visible fill/stroke colors
-    for tag in soup.find_all(True):
-        if not is_visible(tag):
-            continue
-        for attr in ['fill', 'stroke']:
-            val = tag.get(attr)
-            if val and val.strip().lower() not in ['none', 'transparent'] and not val.startswith('url('):
-                colors.add(normalize_color(val))
-        style = tag.get('style')
-        if style:
-            for part in style.split(';'):
-                if ':' in part:
-                    prop, color_val = part.split(':', 1)
-                    prop = prop.strip().lower()
-                    color_val = color_val.strip()
-                    if prop not in ['fill', 'stroke']:
-                        continue
-                    if color_val.lower() in ['none', 'transparent'] or color_val.startswith('url('):
-                        continue
-                    colors.add(normalize_color(color_val))
-    # 2. Extract gradient stop colors
-    for grad in soup.find_all(['linearGradient', 'radialGradient']):
-        for stop in grad.find_all('stop'):
-            stop_color = stop.get('stop-color')
-            if stop_color:
-                colors.add(normalize_color(stop_color))
-            stop_style = stop.get('style')
-            if stop_style:
-                # Only add stop-color, ignore stop-opacity, offset, etc.
-                for part in stop_style.split(';'):
-                    if part.strip().startswith('stop-color:'):
-                        color_val = part.split(':',1)[1].strip()
-                        colors.add(normalize_color(color_val))
-    return len(colors), colors
-
-def detect_colors(file_path):
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext == '.png':
-        return count_png_colors(file_path)
-    elif ext == '.svg':
-        return extract_svg_colors(file_path)
-    else:
-        return 0, set()
-
-if __name__ == "__main__":
-    file_path = input("Enter path to image file (.png or .svg): ").strip()
-    if not os.path.isfile(file_path):
-        print("File not found. Please check the path.")
-    else:
-        count, colors = detect_colors(file_path)
-        print(f"\n✅ Total Colors Detected: {count}")
-        print("🎨 Unique Colors List:")
-        for color in colors:
-            print(color)
\ No newline at end of file
+from PIL import Image
+import numpy as np
+from functools import lru_cache
+from io import BytesIO
+import os
+import re
+from metrics import timed
+
+# Format backends (cv2 for k-means, lxml/bs4 for SVG, fitz for PDF) are
+# imported on first use, so a process only loads what its files need;
+# startup.warm_up preloads them in pool workers.
+
+RASTER_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Per-channel precision of the compressed color histogram used by the
+# "histogram" engine: 6 bits -> 64^3 = 262144 bins.
+HISTOGRAM_BITS = 6
+SAMPLING_METHODS = ("stride", "random", "stratified")
+# Upper bound on the rows*width pixels materialized at once when scanning the
+# full image for minority colors during sampling.
+STRIP_PIXELS = 1 << 20
+# Images with more pixels than this are clustered in tiled mode: the color
+# histogram is accumulated one strip of STRIP_PIXELS at a time and k-means
+# runs on its occupied bins, so no full-size RGBA, mask or float copy is made.
+TILED_PIXELS = 16_000_000
+# The "kmeans" engine picks its seeding on the color histogram and runs one
+# OpenCV k-means pass over the pixels. While the mean squared distance per
+# pixel stays above this target, up to KMEANS_RETRY_ATTEMPTS k-means++
+# seedings are also tried on the histogram.
+KMEANS_COMPACTNESS_TARGET = 100.0
+KMEANS_RETRY_ATTEMPTS = 2
+# n_colors="auto" grows the palette one cluster at a time up to
+# AUTO_MAX_COLORS and stops before a split that leaves two colors closer
+# than AUTO_MERGE_DELTA_E (CIE76 in Lab) or that removes less than
+# AUTO_MIN_GAIN of the single-color distortion (the elbow).
+AUTO_MAX_COLORS = 16
+AUTO_MERGE_DELTA_E = 10.0
+AUTO_MIN_GAIN = 0.01
+
+def count_png_colors(source, n_colors=5, engine="kmeans", sample=None,
+                     max_pixels=250_000, min_share=0.001, info=None, tiled=None):
+    _check_raster_options(n_colors, engine, sample, min_share)
+    if not isinstance(source, (np.ndarray, Image.Image)):
+        source = _open_image(source)
+    if tiled is None:
+        tiled = _pixel_count(source) > TILED_PIXELS
+    if tiled:
+        return _count_colors_tiled(source, n_colors, engine, sample, info)
+    with timed(info, "sample"):
+        pixels = _opaque_pixels(source, sample, max_pixels, min_share, info)
+    if len(pixels) == 0:
+        return 0, set()
+    with timed(info, "cluster"):
+        if engine == "histogram":
+            # Cluster the compact set of distinct colors instead of every pixel
+            colors, weights = _color_histogram(pixels)
+            if n_colors == "auto":
+                centers = _auto_kmeans(colors, weights)
+            else:
+                centers = _weighted_kmeans(colors, weights, min(n_colors, len(colors)))
+            centers = np.clip(np.rint(centers), 0, 255).astype(np.uint8)
+            return _palette_from_centers(centers)
+        # Use OpenCV k-means to find dominant colors
+        Z = pixels.reshape((-1, 3)).astype(np.float32)
+        K = n_colors if n_colors == "auto" else min(n_colors, len(Z))
+        centers = _seeded_kmeans(pixels, Z, K)
+        centers = np.uint8(centers)
+        return _palette_from_centers(centers)
+
+def count_colors_batch(sources, n_colors=5, engine="kmeans", sample=None,
+                       max_pixels=250_000, min_share=0.001, infos=None):
+    """
+    count_png_colors for many images in one call, for batches of small
+    icons where per-image overhead outweighs the clustering itself. With
+    the histogram engine each image is reduced to its occupied histogram
+    bins (from the same pixels count_png_colors would cluster) and k-means
+    runs for all of them at once over one segmented array of bins, see
+    _segmented_kmeans; n_colors="auto" sweeps each image on its own bins.
+    The kmeans engine refines on every pixel of an image, so those images
+    are clustered one by one. Either way the palettes are those of
+    count_png_colors. `infos` holds one info dict per image; the batch
+    clustering time is split evenly over them.
+    Returns one (count, colors) pair per source.
+    """
+    _check_raster_options(n_colors, engine, sample, min_share)
+    infos = infos if infos is not None else [None] * len(sources)
+    if engine == "kmeans":
+        return [count_png_colors(source, n_colors, engine, sample, max_pixels, min_share, info)
+                for source, info in zip(sources, infos)]
+    bins = []
+    for source, info in zip(sources, infos):
+        if not isinstance(source, (np.ndarray, Image.Image)):
+            source = _open_image(source)
+        with timed(info, "sample"):
+            if _pixel_count(source) > TILED_PIXELS:
+                counts, sums = _new_histogram()
+                for pixels in _iter_opaque_strips(source):
+                    _accumulate_histogram(pixels, counts, sums)
+                bins.append(_occupied_bins(counts, sums))
+            else:
+                bins.append(_sparse_histogram(_opaque_pixels(source, sample, max_pixels, min_share, info)))
+
+    results = [(0, set())] * len(sources)
+    present = [i for i, (colors, _) in enumerate(bins) if len(colors)]
+    cluster_info: dict = {}
+    with timed(cluster_info, "cluster"):
+        if n_colors == "auto":
+            centers = [_auto_kmeans(*bins[i]) for i in present]
+        elif present:
+            sets = [bins[i] for i in present]
+            ks = np.minimum(n_colors, [len(colors) for colors, _ in sets])
+            centers = _segmented_kmeans(sets, ks)
+            centers = [centers[row, :ks[row]] for row in range(len(sets))]
+        else:
+            centers = []
+        for i, image_centers in zip(present, centers):
+            results[i] = _palette_from_centers(np.clip(np.rint(image_centers), 0, 255).astype(np.uint8))
+    share = cluster_info["timings"]["cluster"] / max(1, len(sources))
+    for info in infos:
+        if info is not None:
+            info.setdefault("timings", {})["cluster"] = share
+    return results
+
+def _segmented_kmeans(sets, ks, max_iter=20, eps=1.0):
+    """
+    _weighted_kmeans for many (points, weights) sets at once, set i with
+    ks[i] centers seeded as _seed_centers does. Every step is vectorized
+    over the sets laid back to back, and a set stops updating once its
+    centers move less than eps, so each set ends with exactly the centers
+    it would get on its own.
+    Returns a (sets, max(ks), 3) array; row i is valid up to ks[i].
+    """
+    points = np.concatenate([set_points for set_points, _ in sets])
+    weights = np.concatenate([set_weights for _, set_weights in sets])
+    sizes = np.array([len(set_points) for set_points, _ in sets])
+    n_sets, k = len(sets), int(ks.max())
+    segment = np.repeat(np.arange(n_sets), sizes)
+    valid = np.arange(k)[None, :] < ks[:, None]
+
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    centers = np.zeros((n_sets, k, 3), dtype=np.float64)
+    centers[:, 0] = points[_segment_argmax(weights, segment, starts)]
+    min_dist = ((points - centers[segment, 0]) ** 2).sum(axis=1)
+    for i in range(1, k):
+        centers[:, i] = points[_segment_argmax(weights * min_dist, segment, starts)]
+        dist = ((points - centers[segment, i]) ** 2).sum(axis=1)
+        min_dist = np.where(valid[segment, i], np.minimum(min_dist, dist), min_dist)
+
+    active = np.ones(n_sets, dtype=bool)
+    for _ in range(max_iter):
+        dist = ((points[:, None, :] - centers[segment]) ** 2).sum(axis=2)
+        dist[~valid[segment]] = np.inf
+        cluster = segment * k + dist.argmin(axis=1)
+        cluster_weights = np.bincount(cluster, weights=weights, minlength=n_sets * k).reshape(n_sets, k)
+        new_centers = centers.copy()
+        filled = (cluster_weights > 0) & active[:, None]
+        for channel in range(3):
+            sums = np.bincount(cluster, weights=weights * points[:, channel], minlength=n_sets * k)
+            new_centers[:, :, channel][filled] = sums.reshape(n_sets, k)[filled] / cluster_weights[filled]
+        shift = np.abs(new_centers - centers).max(axis=(1, 2))
+        centers = new_centers
+        active &= shift >= eps
+        if not active.any():
+            break
+    return centers
+
+def _segment_argmax(values, segment, starts):
+    """Index of the first maximum of `values` within each segment, like np.argmax per set."""
+    best = np.maximum.reduceat(values, starts)
+    candidates = np.where(values == best[segment], np.arange(len(values)), len(values))
+    return np.minimum.reduceat(candidates, starts)
+
+def _count_colors_tiled(source, n_colors, engine, sample, info=None):
+    """
+    Tiled mode of count_png_colors: every opaque pixel is counted, one strip
+    at a time, into the color histogram and both engines cluster its
+    occupied bins. The "kmeans" engine picks its seeding exactly as
+    _seeded_kmeans does and refines it with _refine_on_strips, which gives
+    the palette of the regular path.
+    """
+    with timed(info, "sample"):
+        counts, sums = _new_histogram()
+        for pixels in _iter_opaque_strips(source):
+            _accumulate_histogram(pixels, counts, sums)
+        if info is not None and sample is not None:
+            info["sampled_fraction"] = 1.0
+    colors, weights = _occupied_bins(counts, sums)
+    if len(colors) == 0:
+        return 0, set()
+    with timed(info, "cluster"):
+        if n_colors == "auto":
+            centers = _auto_kmeans(colors, weights)
+        elif engine == "histogram":
+            centers = _weighted_kmeans(colors, weights, min(n_colors, len(colors)))
+        else:
+            centers = _best_histogram_seeding(colors, weights, min(n_colors, len(colors)))
+        if engine == "histogram":
+            return _palette_from_centers(np.clip(np.rint(centers), 0, 255).astype(np.uint8))
+        centers = _refine_on_strips(source, counts, sums, centers)
+        return _palette_from_centers(np.uint8(centers))
+
+def _refine_on_strips(source, counts, sums, centers, bits=HISTOGRAM_BITS, max_iter=20, eps=1.0):
+    """
+    The OpenCV k-means refinement of _seeded_kmeans for tiled mode. Pixels
+    start labelled through their histogram bins; each iteration then sums
+    every pixel into the cluster of its nearest center. A bin whose whole
+    color cube is nearest one center (all eight corners agree, cells being
+    convex) is added from the histogram, and only the pixels of bins that
+    straddle two clusters are read again, one strip at a time. Sums are
+    exact, so the centers match cv2.kmeans with the same criteria (max_iter
+    iterations, or until no center moves more than eps) up to the float32
+    rounding of OpenCV's own sums.
+    """
+    k = len(centers)
+    occupied = np.flatnonzero(counts)
+    bin_counts, bin_sums = counts[occupied].astype(np.float64), sums[occupied]
+    bin_colors = bin_sums / bin_counts[:, None]
+    bin_labels = ((bin_colors[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    centers = None
+    for iteration in range(1, max(max_iter, 2) + 1):
+        if centers is not None:
+            bin_labels = _cube_labels(occupied, centers, bits)
+        uniform = bin_labels >= 0
+        cluster_counts = np.bincount(bin_labels[uniform], weights=bin_counts[uniform], minlength=k)
+        cluster_sums = np.stack([np.bincount(bin_labels[uniform], weights=bin_sums[uniform, channel], minlength=k)
+                                 for channel in range(3)], axis=1)
+        if not uniform.all():
+            straddling = np.zeros(1 << (3 * bits), dtype=bool)
+            straddling[occupied[~uniform]] = True
+            for pixels in _iter_opaque_strips(source):
+                pixels = pixels[straddling[_histogram_index(pixels, bits)]]
+                labels = _nearest_centers(pixels.astype(np.float32), centers)
+                cluster_counts += np.bincount(labels, minlength=k)
+                for channel in range(3):
+                    cluster_sums[:, channel] += np.bincount(labels, weights=pixels[:, channel], minlength=k)
+        new_centers = np.zeros((k, 3), dtype=np.float32) if centers is None else centers.copy()
+        filled = cluster_counts > 0
+        new_centers[filled] = cluster_sums[filled] / cluster_counts[filled, None]
+        shift = np.inf if centers is None else ((new_centers - centers) ** 2).sum(axis=1).max()
+        centers = new_centers
+        if iteration == max(max_iter, 2) or shift <= eps * eps:
+            return centers
+
+def _cube_labels(occupied, centers, bits=HISTOGRAM_BITS):
+    """Nearest center of every color in each histogram bin, or -1 where the bin spans several."""
+    mask, step = (1 << bits) - 1, 1 << (8 - bits)
+    low = np.stack([(occupied >> (2 * bits)) & mask, (occupied >> bits) & mask, occupied & mask], axis=1) * step
+    offsets = np.array([[r, g, b] for r in (0, step - 1) for g in (0, step - 1) for b in (0, step - 1)])
+    corners = (low[:, None, :] + offsets[None, :, :]).reshape(-1, 3).astype(np.float32)
+    labels = _nearest_centers(corners, centers).reshape(len(occupied), len(offsets))
+    return np.where((labels == labels[:, :1]).all(axis=1), labels[:, 0], -1)
+
+def _nearest_centers(Z, centers):
+    return ((Z[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+
+def _seeded_kmeans(pixels, Z, k, bits=HISTOGRAM_BITS):
+    """
+    Deterministic OpenCV k-means: the restarts run on the small set of
+    occupied histogram bins, and only the best seeding is refined with a
+    single pass over the pixels, so identical input always gives identical
+    centers. The farthest-point seeding from histogram peaks is tried
+    first; k-means++ restarts from fixed RNG seeds are only paid for while
+    the mean squared distance per pixel stays above KMEANS_COMPACTNESS_TARGET.
+    With k="auto" the palette size and seeding come from _auto_kmeans.
+    """
+    if k != "auto" and len(Z) <= k:
+        # Every pixel is its own center (OpenCV also misreads a single row)
+        return Z
+    counts, sums = _new_histogram(bits)
+    _accumulate_histogram(pixels, counts, sums, bits)
+    occupied = np.flatnonzero(counts)
+    bin_colors, weights = _occupied_bins(counts, sums)
+
+    if k == "auto":
+        best = _auto_kmeans(bin_colors, weights)
+        k = len(best)
+        if len(Z) <= k:
+            return Z
+    else:
+        best = _best_histogram_seeding(bin_colors, weights, min(k, len(occupied)))
+
+    import cv2
+
+    # Label every pixel through its bin: nearest center to the bin's mean color
+    bin_labels = np.zeros(len(counts), dtype=np.int32)
+    bin_labels[occupied] = ((bin_colors[:, None, :] - best[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    labels = bin_labels[_histogram_index(pixels, bits)].reshape(-1, 1)
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1.0)
+    _, _, centers = cv2.kmeans(Z, k, labels, criteria, 1, cv2.KMEANS_USE_INITIAL_LABELS)
+    return centers
+
+def _best_histogram_seeding(bin_colors, weights, k_bins):
+    best, best_compactness = None, np.inf
+    for attempt in range(KMEANS_RETRY_ATTEMPTS + 1):
+        seeds = None
+        if attempt:
+            seeds = _kmeans_pp_centers(bin_colors, weights, k_bins, np.random.default_rng(attempt))
+        centers = _weighted_kmeans(bin_colors, weights, k_bins, centers=seeds)
+        dist = ((bin_colors[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+        compactness = (weights * dist).sum() / weights.sum()
+        if compactness < best_compactness:
+            best, best_compactness = centers, compactness
+        if best_compactness <= KMEANS_COMPACTNESS_TARGET:
+            break
+    return best
+
+def _auto_kmeans(points, weights, max_k=AUTO_MAX_COLORS, delta_e=AUTO_MERGE_DELTA_E, min_gain=AUTO_MIN_GAIN):
+    """
+    Choose the palette size and centers in one sweep over weighted points.
+    Each step keeps the previous centers, adds the point farthest from them
+    (by weighted squared distance) and re-runs k-means from there, so a
+    whole sweep costs little more than one clustering. The sweep stops
+    before a step whose centers include two colors closer than `delta_e`,
+    or whose distortion drop is below `min_gain` of the one-color distortion.
+    """
+    total = weights.sum()
+    centers = (weights[:, None] * points).sum(axis=0, keepdims=True) / total
+    min_dist = ((points - centers[0]) ** 2).sum(axis=1)
+    base = distortion = (weights * min_dist).sum()
+    for k in range(2, min(max_k, len(points)) + 1):
+        score = weights * min_dist
+        if score.max() == 0:
+            break
+        seeded = np.vstack([centers, points[np.argmax(score)]])
+        candidate = _weighted_kmeans(points, weights, k, centers=seeded)
+        lab = _rgb_to_lab(candidate)
+        gaps = np.sqrt(((lab[:, None, :] - lab[None, :, :]) ** 2).sum(axis=2))
+        if gaps[np.triu_indices(k, 1)].min() < delta_e:
+            break
+        candidate_dist = ((points[:, None, :] - candidate[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+        candidate_distortion = (weights * candidate_dist).sum()
+        if distortion - candidate_distortion < min_gain * base:
+            break
+        centers, min_dist, distortion = candidate, candidate_dist, candidate_distortion
+    return centers
+
+def _rgb_to_lab(rgb):
+    """CIE L*a*b* (D65) for an (N, 3) array of sRGB values in 0..255."""
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    c = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = c @ np.array([
+        [0.4124564, 0.2126729, 0.0193339],
+        [0.3575761, 0.7151522, 0.1191920],
+        [0.1804375, 0.0721750, 0.9503041],
+    ])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])], axis=1)
+
+def _check_raster_options(n_colors, engine, sample, min_share=0.001):
+    if engine not in ("kmeans", "histogram"):
+        raise ValueError(f"Unknown clustering engine: {engine}")
+    if n_colors != "auto" and (not isinstance(n_colors, int) or n_colors < 1):
+        raise ValueError(f"n_colors must be a positive integer or 'auto': {n_colors!r}")
+    if sample is not None and sample not in SAMPLING_METHODS:
+        raise ValueError(f"Unknown sampling method: {sample}")
+    if not 0 <= min_share <= 1:
+        raise ValueError(f"min_share must be between 0 and 1: {min_share!r}")
+
+def _opaque_pixels(source, sample, max_pixels, min_share, info=None):
+    """The (N, 3) opaque pixels count_png_colors clusters: all of them, or a sample."""
+    np_img = _load_rgba(source)
+    if sample is None:
+        # Remove fully transparent pixels
+        return np_img[np_img[:, :, 3] != 0][:, :3]
+    return _sample_opaque_pixels(np_img, sample, max_pixels, min_share, info)
+
+def _load_rgba(source):
+    """
+    Return an (H, W, 4) uint8 RGBA array for a file path, encoded image
+    bytes, a PIL image or an (H, W), (H, W, 3) or (H, W, 4) uint8 array.
+    """
+    if isinstance(source, np.ndarray):
+        if source.ndim == 3 and source.shape[2] == 4:
+            return source
+        if source.ndim == 3 and source.shape[2] == 3:
+            alpha = np.full(source.shape[:2] + (1,), 255, dtype=np.uint8)
+            return np.concatenate([source, alpha], axis=2)
+        image = Image.fromarray(source)
+    elif isinstance(source, Image.Image):
+        image = source
+    else:
+        image = _open_image(source)
+    return np.array(image.convert("RGBA"))
+
+def _open_image(source):
+    """Open encoded image bytes or a file path with PIL without decoding the pixels yet."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return Image.open(BytesIO(source))
+    return Image.open(source)
+
+def _pixel_count(source):
+    if isinstance(source, np.ndarray):
+        return source.shape[0] * source.shape[1]
+    return source.width * source.height
+
+def _iter_opaque_strips(source, strip_pixels=STRIP_PIXELS):
+    """
+    Yield the opaque pixels of an image array or PIL image as (N, 3) uint8
+    arrays, one band of at most ~strip_pixels pixels at a time. Arrays are
+    sliced as views and PIL images are converted to RGBA band by band, so
+    the only full-size buffer is the decoded image itself.
+    """
+    if isinstance(source, np.ndarray):
+        height, width = source.shape[:2]
+    else:
+        width, height = source.size
+    rows = max(1, strip_pixels // max(1, width))
+    for top in range(0, height, rows):
+        if isinstance(source, np.ndarray):
+            strip = _load_rgba(source[top:top + rows])
+        else:
+            strip = np.asarray(source.crop((0, top, width, min(height, top + rows))).convert("RGBA"))
+        strip = strip.reshape(-1, 4)
+        yield strip[strip[:, 3] != 0][:, :3]
+
+def _palette_from_centers(centers):
+    color_labels = set()
+    for center in centers:
+        if tuple(center) == (255, 255, 255):
+            color_labels.add('white')
+        else:
+            color_labels.add('#{:02X}{:02X}{:02X}'.format(*center))
+    return len(color_labels), color_labels
+
+def _sample_opaque_pixels(np_img, method, max_pixels, min_share, info=None):
+    """
+    Pick at most ~max_pixels pixels of an (H, W, 4) RGBA array and return the
+    opaque ones as (N, 3). Sampling works on views of np_img, so the only
+    full-size copy is the decoded image itself. When min_share is set, every
+    histogram bin holding at least that share of the opaque pixels is topped
+    up so the sample represents it at least in proportion to its share.
+    The fraction of opaque pixels actually clustered is stored in
+    info["sampled_fraction"].
+    """
+    height, width = np_img.shape[:2]
+    opaque_total = int(np.count_nonzero(np_img[:, :, 3]))
+    if height * width <= max_pixels:
+        picked = np_img.reshape(-1, 4)
+    else:
+        rng = np.random.default_rng(0)
+        step = int(np.ceil(np.sqrt(height * width / max_pixels)))
+        if method == "stride":
+            picked = np_img[::step, ::step].reshape(-1, 4)
+        elif method == "random":
+            picked = np_img.reshape(-1, 4)[rng.integers(0, height * width, size=max_pixels)]
+        else:
+            # One jittered pixel per step x step cell
+            rows = np.arange(0, height, step)
+            cols = np.arange(0, width, step)
+            ys = np.minimum(rows[:, None] + rng.integers(0, step, (len(rows), len(cols))), height - 1)
+            xs = np.minimum(cols[None, :] + rng.integers(0, step, (len(rows), len(cols))), width - 1)
+            picked = np_img[ys, xs].reshape(-1, 4)
+    pixels = picked[picked[:, 3] != 0][:, :3]
+    if min_share and len(pixels) < opaque_total:
+        pixels = _keep_minority_colors(np_img, pixels, opaque_total, min_share)
+    if info is not None:
+        info["sampled_fraction"] = min(1.0, len(pixels) / opaque_total) if opaque_total else 1.0
+    return pixels
+
+def _keep_minority_colors(np_img, pixels, opaque_total, min_share, bits=HISTOGRAM_BITS):
+    counts, sums = _new_histogram(bits)
+    for strip in _iter_opaque_strips(np_img):
+        _accumulate_histogram(strip, counts, sums, bits)
+    share = counts / opaque_total
+    wanted = np.maximum(1, np.ceil(share * len(pixels)))
+    have = np.bincount(_histogram_index(pixels, bits), minlength=len(counts))
+    deficit = np.where(share >= min_share, np.maximum(wanted - have, 0), 0).astype(np.int64)
+    missing = np.flatnonzero(deficit)
+    if len(missing) == 0:
+        return pixels
+    colors = np.rint(sums[missing] / counts[missing, None]).astype(np.uint8)
+    return np.concatenate([pixels, np.repeat(colors, deficit[missing], axis=0)])
+
+def _histogram_index(pixels, bits=HISTOGRAM_BITS):
+    shift = 8 - bits
+    index = (pixels[:, 0].astype(np.int32) >> shift) << (2 * bits)
+    index |= (pixels[:, 1].astype(np.int32) >> shift) << bits
+    index |= pixels[:, 2].astype(np.int32) >> shift
+    return index
+
+def _new_histogram(bits=HISTOGRAM_BITS):
+    n_bins = 1 << (3 * bits)
+    return np.zeros(n_bins, dtype=np.int64), np.zeros((n_bins, 3), dtype=np.float64)
+
+def _accumulate_histogram(pixels, counts, sums, bits=HISTOGRAM_BITS):
+    """Add an (N, 3) uint8 pixel array to running per-bin counts and RGB sums."""
+    index = _histogram_index(pixels, bits)
+    counts += np.bincount(index, minlength=len(counts))
+    for channel in range(3):
+        sums[:, channel] += np.bincount(index, weights=pixels[:, channel], minlength=len(counts))
+
+def _color_histogram(pixels, bits=HISTOGRAM_BITS):
+    """
+    Reduce an (N, 3) uint8 pixel array to its occupied histogram bins.
+    Returns (colors, weights): the mean RGB of each occupied bin as float64
+    and the number of pixels that fell into it. Logos have few distinct
+    colors, so each bin usually holds exactly one color and its mean is exact.
+    """
+    counts, sums = _new_histogram(bits)
+    _accumulate_histogram(pixels, counts, sums, bits)
+    return _occupied_bins(counts, sums)
+
+def _sparse_histogram(pixels, bits=HISTOGRAM_BITS):
+    """
+    _color_histogram without allocating every bin: costs O(N log N) in the
+    pixels instead of O(bins), which dominates for small images. Bins come
+    out in the same order and with bit-identical means.
+    """
+    occupied, inverse = np.unique(_histogram_index(pixels, bits), return_inverse=True)
+    weights = np.bincount(inverse, minlength=len(occupied)).astype(np.float64)
+    sums = np.stack([
+        np.bincount(inverse, weights=pixels[:, channel], minlength=len(occupied)) for channel in range(3)
+    ], axis=1)
+    return sums / weights[:, None], weights
+
+def _occupied_bins(counts, sums):
+    """The mean color and pixel count of every non-empty histogram bin."""
+    occupied = np.flatnonzero(counts)
+    weights = counts[occupied].astype(np.float64)
+    return sums[occupied] / weights[:, None], weights
+
+def _seed_centers(points, weights, k):
+    """
+    Deterministic k-means seeding over weighted points: the heaviest color
+    first, then repeatedly the point with the largest weighted squared
+    distance to the chosen centers.
+    """
+    centers = np.empty((k, 3), dtype=np.float64)
+    centers[0] = points[np.argmax(weights)]
+    min_dist = ((points - centers[0]) ** 2).sum(axis=1)
+    for i in range(1, k):
+        centers[i] = points[np.argmax(weights * min_dist)]
+        min_dist = np.minimum(min_dist, ((points - centers[i]) ** 2).sum(axis=1))
+    return centers
+
+def _kmeans_pp_centers(points, weights, k, rng):
+    """k-means++ seeding over weighted points with the given generator."""
+    centers = np.empty((k, 3), dtype=np.float64)
+    centers[0] = points[rng.choice(len(points), p=weights / weights.sum())]
+    min_dist = ((points - centers[0]) ** 2).sum(axis=1)
+    for i in range(1, k):
+        score = weights * min_dist
+        total = score.sum()
+        if total == 0:
+            centers[i:] = centers[0]
+            break
+        centers[i] = points[rng.choice(len(points), p=score / total)]
+        min_dist = np.minimum(min_dist, ((points - centers[i]) ** 2).sum(axis=1))
+    return centers
+
+def _weighted_kmeans(points, weights, k, max_iter=20, eps=1.0, centers=None):
+    """
+    Lloyd's k-means over weighted points, with the same termination criteria
+    as the OpenCV path (20 iterations or centers moving less than eps).
+    Unless initial centers are given, seeding is deterministic, see
+    _seed_centers.
+    """
+    if centers is None:
+        centers = _seed_centers(points, weights, k)
+    for _ in range(max_iter):
+        dist = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = dist.argmin(axis=1)
+        cluster_weights = np.bincount(labels, weights=weights, minlength=k)
+        new_centers = centers.copy()
+        filled = cluster_weights > 0
+        for channel in range(3):
+            sums = np.bincount(labels, weights=weights * points[:, channel], minlength=k)
+            new_centers[filled, channel] = sums[filled] / cluster_weights[filled]
+        shift = np.abs(new_centers - centers).max()
+        centers = new_centers
+        if shift < eps:
+            break
+    return centers
+
+SVG_ENGINES = ("lxml", "soup")
+_SVG_WHITE_NAMES = {'#fff', '#ffffff', 'white'}
+_SVG_WHITE_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'rgb\s*\(\s*255\s*,\s*255\s*,\s*255\s*\)',
+    r'rgb\s*\(\s*100%\s*,\s*100%\s*,\s*100%\s*\)',
+    r'rgba\s*\(\s*255\s*,\s*255\s*,\s*255\s*,\s*1(\.0*)?\s*\)',
+    r'rgba\s*\(\s*100%\s*,\s*100%\s*,\s*100%\s*,\s*1(\.0*)?\s*\)',
+))
+_SVG_RGB_PATTERN = re.compile(r'rgb\s*\(([^)]+)\)')
+_SVG_GRADIENT_TAGS = {'linearGradient', 'radialGradient'}
+
+def extract_svg_colors(source, engine="lxml"):
+    """
+    Return (count, colors) for the fill, stroke and gradient stop colors of
+    an SVG given as a path or bytes. The default "lxml" engine streams the
+    document in one pass and skips everything inside hidden groups; "soup"
+    is the original BeautifulSoup tree walk.
+    """
+    if engine == "lxml":
+        return _extract_svg_colors_lxml(source)
+    if engine == "soup":
+        return _extract_svg_colors_soup(source)
+    raise ValueError(f"Unknown SVG engine: {engine}")
+
+@lru_cache(maxsize=4096)
+def _normalize_svg_color(color):
+    color = color.strip().lower()
+    if color in _SVG_WHITE_NAMES or any(pattern.match(color) for pattern in _SVG_WHITE_PATTERNS):
+        return 'white'
+    # Hex color
+    if color.startswith('#'):
+        if len(color) == 4:
+            # e.g. #abc -> #aabbcc
+            color = '#' + ''.join([c*2 for c in color[1:]])
+        return color.upper()
+    # rgb/rgba
+    rgb_match = _SVG_RGB_PATTERN.match(color)
+    if rgb_match:
+        parts = rgb_match.group(1).split(',')
+        if '%' in parts[0]:
+            # rgb(100%,100%,100%)
+            vals = [int(float(p.strip().replace('%','')) * 2.55) for p in parts[:3]]
+        else:
+            vals = [int(float(p.strip())) for p in parts[:3]]
+        return '#{:02X}{:02X}{:02X}'.format(*vals)
+    # named color
+    return color
+
+@lru_cache(maxsize=4096)
+def _parse_svg_style(style):
+    """Split an inline style into ((property, value), ...) in declaration order."""
+    declarations = []
+    for part in style.split(';'):
+        if ':' in part:
+            prop, value = part.split(':', 1)
+            declarations.append((prop.strip().lower(), value.strip()))
+    return tuple(declarations)
+
+def _add_svg_paint(colors, value):
+    if not value:
+        return
+    value = value.strip()
+    if value.lower() in ('none', 'transparent') or value.startswith('url('):
+        return
+    colors.add(_normalize_svg_color(value))
+
+def _svg_opacity_is_zero(value):
+    try:
+        return float(value.strip().rstrip('%')) == 0
+    except ValueError:
+        return False
+
+def _extract_svg_colors_lxml(source):
+    from lxml import etree
+
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    colors = set()
+    # (hidden, invisible) for every open element: display:none and opacity:0
+    # hide the whole subtree, visibility:hidden is inherited but a descendant
+    # may set visibility:visible again.
+    stack = []
+    gradient_depth = 0
+    events = etree.iterparse(
+        source,
+        events=('start', 'end'),
+        recover=True,
+        huge_tree=True,
+        resolve_entities=False,
+        no_network=True,
+    )
+    for event, elem in events:
+        if not isinstance(elem.tag, str):
+            continue
+        name = elem.tag.rsplit('}', 1)[-1]
+        if event == 'end':
+            stack.pop()
+            if name in _SVG_GRADIENT_TAGS:
+                gradient_depth -= 1
+            # Drop finished elements so memory stays flat on huge files
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+            continue
+
+        attrib = elem.attrib
+        style = attrib.get('style')
+        declarations = _parse_svg_style(style) if style else ()
+        display = attrib.get('display')
+        visibility = attrib.get('visibility')
+        opacity = attrib.get('opacity')
+        for prop, value in declarations:
+            if prop == 'display':
+                display = value
+            elif prop == 'visibility':
+                visibility = value
+            elif prop == 'opacity':
+                opacity = value
+
+        hidden, invisible = stack[-1] if stack else (False, False)
+        if (display and display.strip().lower() == 'none') or (opacity and _svg_opacity_is_zero(opacity)):
+            hidden = True
+        if visibility:
+            visibility = visibility.strip().lower()
+            if visibility in ('hidden', 'collapse'):
+                invisible = True
+            elif visibility == 'visible':
+                invisible = False
+        stack.append((hidden, invisible))
+
+        # Gradient stops count whether or not the gradient sits in a hidden group
+        if name in _SVG_GRADIENT_TAGS:
+            gradient_depth += 1
+        elif name == 'stop' and gradient_depth:
+            stop_color = attrib.get('stop-color')
+            if stop_color:
+                colors.add(_normalize_svg_color(stop_color))
+            for prop, value in declarations:
+                if prop == 'stop-color':
+                    colors.add(_normalize_svg_color(value))
+
+        if hidden or invisible:
+            continue
+        for attr in ('fill', 'stroke'):
+            _add_svg_paint(colors, attrib.get(attr))
+        for prop, value in declarations:
+            if prop in ('fill', 'stroke'):
+                _add_svg_paint(colors, value)
+    return len(colors), colors
+
+def _extract_svg_colors_soup(source):
+    def is_white(color):
+        color = color.strip().lower()
+        if color in ['#fff', '#ffffff', '#FFF', '#FFFFFF', 'white']:
+            return True
+        rgb_match = re.match(r'rgb\s*\(\s*255\s*,\s*255\s*,\s*255\s*\)', color)
+        if rgb_match:
+            return True
+        rgb_pct_match = re.match(r'rgb\s*\(\s*100%\s*,\s*100%\s*,\s*100%\s*\)', color)
+        if rgb_pct_match:
+            return True
+        rgba_match = re.match(r'rgba\s*\(\s*255\s*,\s*255\s*,\s*255\s*,\s*1(\.0*)?\s*\)', color)
+        if rgba_match:
+            return True
+        rgba_pct_match = re.match(r'rgba\s*\(\s*100%\s*,\s*100%\s*,\s*100%\s*,\s*1(\.0*)?\s*\)', color)
+        if rgba_pct_match:
+            return True
+        return False
+
+    def is_visible(tag):
+        style = tag.get('style', '')
+        if 'display:none' in style or 'visibility:hidden' in style or 'opacity:0' in style:
+            return False
+        if tag.get('display') == 'none' or tag.get('visibility') == 'hidden' or tag.get('opacity') == '0':
+            return False
+        return True
+
+    def normalize_color(color):
+        color = color.strip().lower()
+        if is_white(color):
+            return 'white'
+        # Hex color
+        if color.startswith('#'):
+            if len(color) == 4:
+                # e.g. #abc -> #aabbcc
+                color = '#' + ''.join([c*2 for c in color[1:]])
+            return color.upper()
+        # rgb/rgba
+        rgb_match = re.match(r'rgb\s*\(([^)]+)\)', color)
+        if rgb_match:
+            parts = rgb_match.group(1).split(',')
+            if '%' in parts[0]:
+                # rgb(100%,100%,100%)
+                vals = [int(float(p.strip().replace('%','')) * 2.55) for p in parts[:3]]
+            else:
+                vals = [int(float(p.strip())) for p in parts[:3]]
+            return '#{:02X}{:02X}{:02X}'.format(*vals)
+        # named color
+        return color
+
+    from bs4 import BeautifulSoup
+
+    if isinstance(source, (bytes, bytearray)):
+        soup = BeautifulSoup(source, 'xml')
+    else:
+        with open(source, 'r', encoding='utf-8') as file:
+            soup = BeautifulSoup(file.read(), 'xml')
+    colors = set()
+    # 1. Extract visible fill/stroke colors
+    for tag in soup.find_all(True):
+        if not is_visible(tag):
+            continue
+        for attr in ['fill', 'stroke']:
+            val = tag.get(attr)
+            if val and val.strip().lower() not in ['none', 'transparent'] and not val.startswith('url('):
+                colors.add(normalize_color(val))
+        style = tag.get('style')
+        if style:
+            for part in style.split(';'):
+                if ':' in part:
+                    prop, color_val = part.split(':', 1)
+                    prop = prop.strip().lower()
+                    color_val = color_val.strip()
+                    if prop not in ['fill', 'stroke']:
+                        continue
+                    if color_val.lower() in ['none', 'transparent'] or color_val.startswith('url('):
+                        continue
+                    colors.add(normalize_color(color_val))
+    # 2. Extract gradient stop colors
+    for grad in soup.find_all(['linearGradient', 'radialGradient']):
+        for stop in grad.find_all('stop'):
+            stop_color = stop.get('stop-color')
+            if stop_color:
+                colors.add(normalize_color(stop_color))
+            stop_style = stop.get('style')
+            if stop_style:
+                # Only add stop-color, ignore stop-opacity, offset, etc.
+                for part in stop_style.split(';'):
+                    if part.strip().startswith('stop-color:'):
+                        color_val = part.split(':',1)[1].strip()
+                        colors.add(normalize_color(color_val))
+    return len(colors), colors
+
+def extract_pdf_colors(source, page_index=0, **raster_options):
+    """
+    Return (count, colors) for a PDF page read from its vector content
+    instead of a rendering: fill and stroke colors of every drawing, the
+    colors of visible text, and k-means palettes of embedded raster images
+    (the only part that still needs clustering). MuPDF converts CMYK, gray
+    and spot colors to RGB, so values are exact. `source` is a path or bytes.
+    """
+    import fitz  # PyMuPDF for vector-native PDF colors
+
+    if isinstance(source, (bytes, bytearray)):
+        doc = fitz.open(stream=source, filetype="pdf")
+    else:
+        doc = fitz.open(source)
+    try:
+        page = doc[page_index]
+        colors = set()
+        for drawing in page.get_drawings():
+            if drawing.get("fill") is not None and drawing.get("fill_opacity") != 0:
+                colors.add(_pdf_color_label(drawing["fill"]))
+            if drawing.get("color") is not None and drawing.get("stroke_opacity") != 0:
+                colors.add(_pdf_color_label(drawing["color"]))
+        for span in page.get_texttrace():
+            # Type 3 is invisible text, e.g. an OCR layer
+            if span["type"] != 3 and span["opacity"] != 0:
+                colors.add(_pdf_color_label(span["color"]))
+        for image in page.get_images(full=True):
+            pix = fitz.Pixmap(doc, image[0])
+            if pix.colorspace is None:
+                # Stencil masks carry no color of their own
+                continue
+            if pix.colorspace.n != 3:
+                pix = fitz.Pixmap(fitz.csRGB, pix)
+            pixels = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+            colors |= count_png_colors(pixels, **raster_options)[1]
+    finally:
+        doc.close()
+    return len(colors), colors
+
+def _pdf_color_label(components):
+    """Hex label for an RGB, gray or CMYK tuple of floats in 0..1."""
+    if len(components) == 1:
+        components = components * 3
+    elif len(components) == 4:
+        c, m, y, k = components
+        components = ((1 - c) * (1 - k), (1 - m) * (1 - k), (1 - y) * (1 - k))
+    rgb = tuple(int(round(min(max(value, 0.0), 1.0) * 255)) for value in components[:3])
+    if rgb == (255, 255, 255):
+        return 'white'
+    return '#{:02X}{:02X}{:02X}'.format(*rgb)
+
+def merge_palettes(palettes, delta_e=AUTO_MERGE_DELTA_E):
+    """
+    Merge several color label sets (e.g. one per PDF page) into one
+    palette. Colors found on more palettes win; a color closer than
+    `delta_e` (CIE76 in Lab) to one already kept is folded into it.
+    Ties are broken by first appearance, so the result is deterministic.
+    """
+    seen = {}
+    for position, palette in enumerate(palettes):
+        tally_palette(seen, palette, position)
+    return merge_tallied(seen, delta_e)
+
+def tally_palette(seen, palette, position):
+    """
+    Count the labels of the `position`-th palette into `seen` (label ->
+    (occurrences, first position)), so palettes arriving one at a time can
+    be merged with merge_tallied without recounting the earlier ones.
+    """
+    for label in palette:
+        occurrences, first = seen.get(label, (0, position))
+        seen[label] = (occurrences + 1, first)
+
+def merge_tallied(seen, delta_e=AUTO_MERGE_DELTA_E):
+    """merge_palettes on the tallies built by tally_palette."""
+    ordered = sorted(seen, key=lambda label: (-seen[label][0], seen[label][1], label))
+    hex_labels = [label for label in ordered if label == 'white' or re.fullmatch(r'#[0-9A-F]{6}', label)]
+    if not hex_labels:
+        return set(ordered)
+    lab = _rgb_to_lab([_label_to_rgb(label) for label in hex_labels])
+    kept = np.empty(len(hex_labels), dtype=np.intp)
+    n_kept = 0
+    for i in range(len(hex_labels)):
+        if not n_kept or (((lab[kept[:n_kept]] - lab[i]) ** 2).sum(axis=1) >= delta_e ** 2).all():
+            kept[n_kept] = i
+            n_kept += 1
+    # Labels that are not hex colors (e.g. SVG color names) are kept as they are
+    return {hex_labels[i] for i in kept[:n_kept]} | (set(ordered) - set(hex_labels))
+
+def _label_to_rgb(label):
+    if label == 'white':
+        return (255, 255, 255)
+    return tuple(int(label[i:i + 2], 16) for i in (1, 3, 5))
+
+def detect_colors(source, ext=None, **raster_options):
+    """
+    Detect colors in a file path, in-memory file bytes or a decoded pixel
+    array. Bytes need `ext` (e.g. '.svg') to pick the extractor; arrays and
+    PIL images are always treated as raster input.
+    """
+    if isinstance(source, (np.ndarray, Image.Image)):
+        return count_png_colors(source, **raster_options)
+    if ext is None:
+        ext = os.path.splitext(source)[1]
+    ext = ext.lower()
+    if ext in RASTER_EXTENSIONS:
+        return count_png_colors(source, **raster_options)
+    elif ext == '.svg':
+        with timed(raster_options.get("info"), "svg_parse"):
+            return extract_svg_colors(source)
+    elif ext == '.pdf':
+        return extract_pdf_colors(source, **raster_options)
+    else:
+        return 0, set()
+
+if __name__ == "__main__":
+    # Kept as an entry point for old scripts; the batch CLI lives in cli.py
+    import sys
+    from cli import main
+    sys.exit(main())
@@ -0,0 +1,295 @@
+import os
+import re
+import shutil
+import struct
+import subprocess
+from functools import lru_cache
+from io import BytesIO
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from executor import FILE_TIMEOUT
+from metrics import timed
+
+if TYPE_CHECKING:
+    import fitz  # PyMuPDF, only for annotations; imported on first use below
+
+# Pixels a rasterized vector page should roughly have: the zoom factor is
+# chosen per page from its declared size, so posters don't explode and icons
+# still get enough pixels, within RENDER_MIN_SCALE..RENDER_MAX_SCALE
+RENDER_PIXELS = int(os.environ.get("COLOR_RENDER_PIXELS", "2000000"))
+RENDER_MIN_SCALE = 0.05
+RENDER_MAX_SCALE = 8.0
+# Zoom factor used when a page size cannot be determined
+RENDER_SCALE = 2.0
+# Rendered edge pixels with less alpha than this are dropped as transparent
+UNPREMULTIPLY_MIN_ALPHA = 16
+
+_BOUNDING_BOX = re.compile(rb'%%BoundingBox:\s*(-?[\d.]+)\s+(-?[\d.]+)\s+(-?[\d.]+)\s+(-?[\d.]+)')
+
+# Leading bytes of a DOS EPS binary file (PostScript plus TIFF/WMF preview)
+DOS_EPS_MAGIC = b'\xc5\xd0\xd3\xc6'
+
+# Backend that last succeeded for each signature, tried first next time
+_preferred_backends: Dict[str, str] = {}
+# Backends that are only a fallback and never become preferred
+_LAST_RESORT_BACKENDS = {"tiff_preview"}
+
+
+def sniff_format(content: bytes) -> str:
+    """
+    Identify a vector file from its leading bytes:
+    - "pdf": PDF, including PDF-compatible .ai files
+    - "ps": PostScript, including plain EPS and legacy .ai files
+    - "dos_eps": DOS EPS binary header wrapping PostScript and a preview
+    - "unknown": anything else
+    """
+    if content.startswith(DOS_EPS_MAGIC) and len(content) >= 30:
+        return "dos_eps"
+    head = content[:1024]
+    if head.lstrip().startswith(b'%!PS'):
+        return "ps"
+    if b'%PDF-' in head:
+        return "pdf"
+    return "unknown"
+
+
+def _dos_eps_sections(content: bytes) -> Dict[str, bytes]:
+    """Split a DOS EPS binary file into its "ps", "wmf" and "tiff" sections."""
+    ps_start, ps_length, wmf_start, wmf_length, tiff_start, tiff_length = struct.unpack_from("<6I", content, 4)
+    sections = {"ps": content[ps_start:ps_start + ps_length]}
+    if wmf_start and wmf_length:
+        sections["wmf"] = content[wmf_start:wmf_start + wmf_length]
+    if tiff_start and tiff_length:
+        sections["tiff"] = content[tiff_start:tiff_start + tiff_length]
+    return sections
+
+
+def render_scale(width: float, height: float, pixels: int = RENDER_PIXELS) -> float:
+    """Zoom factor that renders a width x height point page at about `pixels` pixels."""
+    area = max(width, 1.0) * max(height, 1.0)
+    return float(min(RENDER_MAX_SCALE, max(RENDER_MIN_SCALE, (pixels / area) ** 0.5)))
+
+
+def _eps_bounding_box_scale(content: bytes) -> float:
+    match = _BOUNDING_BOX.search(content[:4096])
+    if match is None:
+        return RENDER_SCALE
+    llx, lly, urx, ury = (float(value) for value in match.groups())
+    return render_scale(urx - llx, ury - lly)
+
+
+def _pixmap_to_array(pix: "fitz.Pixmap") -> np.ndarray:
+    """
+    The samples of a PyMuPDF pixmap as an (H, W, n) uint8 array. The
+    samples are copied once, straight from the pixmap's buffer (MuPDF frees
+    it together with the pixmap, so a view could not outlive it), and the
+    copy is fixed up in place: MuPDF premultiplies alpha, so anti-aliased
+    edges are converted back to their straight colors.
+    """
+    pixels = np.array(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    if not pix.alpha:
+        return pixels
+    alpha = pixels[:, :, -1]
+    partial = (alpha > 0) & (alpha < 255)
+    if not partial.any():
+        return pixels
+    # Below this coverage the premultiplied color has too few bits left to
+    # recover, so those pixels are treated as transparent
+    faint = partial & (alpha < UNPREMULTIPLY_MIN_ALPHA)
+    pixels[faint] = 0
+    partial &= ~faint
+    edge = pixels[partial].astype(np.uint32)
+    edge[:, :-1] = np.minimum(255, (edge[:, :-1] * 255 + edge[:, -1:] // 2) // edge[:, -1:])
+    pixels[partial] = edge
+    return pixels
+
+
+def _decode_png(content: bytes) -> np.ndarray:
+    return np.asarray(Image.open(BytesIO(content)).convert("RGBA"))
+
+
+def pdf_page_count(content: bytes) -> int:
+    import fitz  # PyMuPDF, imported on first use
+
+    doc = fitz.open(stream=content, filetype="pdf")
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def render_pdf(content: bytes, page_index: int = 0) -> np.ndarray:
+    """
+    Render one page (the first by default) of an in-memory PDF at the scale
+    that fits RENDER_PIXELS, with a transparent background so the blank
+    page is not counted as a color. Returns an (H, W, 4) uint8 RGBA array.
+    """
+    import fitz  # PyMuPDF, imported on first use
+
+    doc = fitz.open(stream=content, filetype="pdf")
+    try:
+        if len(doc) == 0:
+            raise ValueError("PDF has no pages")
+        page = doc[page_index]
+        scale = render_scale(page.rect.width, page.rect.height)
+        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=True)
+        return _pixmap_to_array(pix)
+    finally:
+        doc.close()
+
+
+@lru_cache(maxsize=None)
+def _ghostscript() -> Optional[str]:
+    return shutil.which("gswin64c") or shutil.which("gswin32c") or shutil.which("gs")
+
+
+@lru_cache(maxsize=None)
+def _imagemagick() -> Optional[str]:
+    return shutil.which("magick") or shutil.which("convert")
+
+
+def _render_ghostscript(content: bytes, page_index: int = 0, scale: float = RENDER_SCALE) -> Optional[np.ndarray]:
+    """Rasterize one page straight to a transparent PNG on stdout, cropped to the EPS bounding box."""
+    gs_executable = _ghostscript()
+    if not gs_executable:
+        return None
+    cmd = [
+        gs_executable,
+        "-q",
+        "-dSAFER",
+        "-dBATCH",
+        "-dNOPAUSE",
+        "-dEPSCrop",
+        f"-dFirstPage={page_index + 1}",
+        f"-dLastPage={page_index + 1}",
+        "-sDEVICE=pngalpha",
+        f"-r{round(72 * scale)}",
+        "-sOutputFile=-",
+        "-",
+    ]
+    # A hung process is killed rather than holding the worker; the
+    # TimeoutExpired moves render_vector on to the next backend
+    result = subprocess.run(cmd, input=content, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=FILE_TIMEOUT)
+    if result.returncode == 0 and result.stdout:
+        return _decode_png(result.stdout)
+    return None
+
+
+def _render_imagemagick(
+    content: bytes,
+    input_format: str,
+    page_index: int = 0,
+    scale: float = RENDER_SCALE,
+) -> Optional[np.ndarray]:
+    magick_executable = _imagemagick()
+    if not magick_executable:
+        return None
+    cmd = [
+        magick_executable,
+        "-density",
+        str(round(72 * scale)),
+        "-background",
+        "none",
+        f"{input_format}:-[{page_index}]",
+        "png:-",
+    ]
+    result = subprocess.run(cmd, input=content, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=FILE_TIMEOUT)
+    if result.returncode == 0 and result.stdout:
+        return _decode_png(result.stdout)
+    return None
+
+
+def _render_pymupdf(content: bytes, page_index: int = 0) -> Optional[np.ndarray]:
+    try:
+        return render_pdf(content, page_index)
+    except Exception:
+        return None
+
+
+def _backends(signature: str, content: bytes, page_index: int = 0) -> List[tuple]:
+    """Candidate (name, render) pairs for a signature, cheapest first."""
+    if signature == "pdf":
+        # The external tools get the page scale PyMuPDF would have used
+        return [
+            ("pymupdf", lambda: _render_pymupdf(content, page_index)),
+            ("ghostscript", lambda: _render_ghostscript(content, page_index, _pdf_page_scale(content, page_index))),
+            ("magick", lambda: _render_imagemagick(content, "pdf", page_index, _pdf_page_scale(content, page_index))),
+        ]
+    if signature == "ps":
+        # PyMuPDF cannot read PostScript, so don't pay for the attempt
+        scale = _eps_bounding_box_scale(content)
+        return [
+            ("ghostscript", lambda: _render_ghostscript(content, scale=scale)),
+            ("magick", lambda: _render_imagemagick(content, "eps", scale=scale)),
+        ]
+    if signature == "dos_eps":
+        sections = _dos_eps_sections(content)
+        scale = _eps_bounding_box_scale(sections["ps"])
+        backends = [
+            ("ghostscript", lambda: _render_ghostscript(sections["ps"], scale=scale)),
+            ("magick", lambda: _render_imagemagick(sections["ps"], "eps", scale=scale)),
+        ]
+        if "tiff" in sections:
+            # Last resort: the low-resolution preview embedded by the exporter
+            backends.append(("tiff_preview", lambda: np.asarray(Image.open(BytesIO(sections["tiff"])).convert("RGBA"))))
+        return backends
+    scale = _eps_bounding_box_scale(content)
+    return [
+        ("pymupdf", lambda: _render_pymupdf(content)),
+        ("ghostscript", lambda: _render_ghostscript(content, scale=scale)),
+        ("magick", lambda: _render_imagemagick(content, "eps", scale=scale)),
+    ]
+
+
+def _pdf_page_scale(content: bytes, page_index: int) -> float:
+    import fitz  # PyMuPDF, imported on first use
+
+    try:
+        doc = fitz.open(stream=content, filetype="pdf")
+    except Exception:
+        return RENDER_SCALE
+    try:
+        rect = doc[page_index].rect
+        return render_scale(rect.width, rect.height)
+    except Exception:
+        return RENDER_SCALE
+    finally:
+        doc.close()
+
+
+def render_vector(content: bytes, info: Optional[Dict[str, Any]] = None, page_index: int = 0) -> np.ndarray:
+    """
+    Render one page (the first by default) of a PDF/AI/EPS/EPM file held
+    in memory. Only PDF-based files have further pages.
+    The header decides which backends are tried, starting with the one that
+    last worked for the same signature (never the DOS EPS TIFF preview). The detected signature and the
+    backend used are stored in info["format"] and info["backend"], and the
+    time spent in all attempts in info["timings"]["render"].
+    The page is rendered at the scale that fits RENDER_PIXELS (from the PDF
+    page size or the EPS bounding box) with a transparent background.
+    Returns the page pixels as an (H, W, 4) uint8 RGBA array.
+    """
+    signature = sniff_format(content)
+    backends = _backends(signature, content, page_index)
+    preferred = _preferred_backends.get(signature)
+    backends.sort(key=lambda backend: backend[0] != preferred)
+
+    for name, render in backends:
+        try:
+            with timed(info, "render"):
+                pixels = render()
+        except Exception:
+            pixels = None
+        if pixels is not None:
+            if name not in _LAST_RESORT_BACKENDS:
+                _preferred_backends[signature] = name
+            if info is not None:
+                info["format"] = signature
+                info["backend"] = name
+            return pixels
+
+    # If all fallbacks fail, surface a clear, user-friendly error
+    raise RuntimeError("This vector file is a raw Illustrator-only format and cannot be processed.")
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import math
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Pool sizing and limits, overridable through the environment
+POOL_WORKERS = int(os.environ.get("COLOR_POOL_WORKERS", os.cpu_count() or 1))
+# Recycle each worker process after this many files to cap leaked memory
+POOL_MAX_TASKS_PER_CHILD = int(os.environ.get("COLOR_POOL_MAX_TASKS_PER_CHILD", "50"))
+# Files allowed to wait for a worker before new submissions are rejected
+POOL_QUEUE_SIZE = int(os.environ.get("COLOR_POOL_QUEUE_SIZE", "1000"))
+# Seconds a single file may run once it has been handed to a worker
+FILE_TIMEOUT = float(os.environ.get("COLOR_FILE_TIMEOUT", "120"))
+# Start every worker and run the pool initializer before the server takes traffic
+POOL_WARMUP = os.environ.get("COLOR_POOL_WARMUP", "1") != "0"
+# Most files FileBatcher hands to one worker call
+BATCH_MAX_FILES = int(os.environ.get("COLOR_BATCH_MAX_FILES", "64"))
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the pool already has POOL_QUEUE_SIZE files waiting."""
+
+
+def kill_pool(pool: ProcessPoolExecutor) -> None:
+    """Kill the workers of `pool`, failing its unfinished futures with BrokenProcessPool."""
+    # ProcessPoolExecutor has no public way to stop a running task
+    for process in list((pool._processes or {}).values()):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _Recycled(Exception):
+    """A file's pool was recycled because a different file timed out."""
+
+
+class DetectionExecutor:
+    """
+    Runs CPU-bound convert-and-detect work in a ProcessPoolExecutor so the
+    asyncio event loop stays responsive:
+    - At most `workers` files are in flight, the rest wait in a bounded queue
+    - Each file gets `timeout` seconds once it reaches a worker. A file
+      that runs longer takes its pool down: the workers are killed so the
+      hung one frees its slot, and the other files that were running in
+      that pool are retried once in the new pool
+    - Workers are replaced after `max_tasks_per_child` files
+    - A pool broken by a crashed worker is rebuilt for the next submission
+    - `initializer` runs in every new worker, including recycled ones,
+      before it takes its first file
+    """
+
+    def __init__(
+        self,
+        workers: int = POOL_WORKERS,
+        max_tasks_per_child: int = POOL_MAX_TASKS_PER_CHILD,
+        queue_size: int = POOL_QUEUE_SIZE,
+        timeout: float = FILE_TIMEOUT,
+        initializer: Optional[Callable[[], Any]] = None,
+    ):
+        self.workers = max(1, workers)
+        self.initializer = initializer
+        self.max_tasks_per_child = max_tasks_per_child
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._recycled: "weakref.WeakSet[ProcessPoolExecutor]" = weakref.WeakSet()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                max_tasks_per_child=self.max_tasks_per_child or None,
+                initializer=self.initializer,
+            )
+        return self._pool
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args) in a worker process and return its result."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        if self._waiting >= self.queue_size:
+            raise QueueFullError("Too many files are waiting for processing")
+        try:
+            return await self._run_once(fn, *args)
+        except _Recycled:
+            return await self._run_once(fn, *args)
+
+    async def _run_once(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        try:
+            pool = self._get_pool()
+            try:
+                future = pool.submit(fn, *args)
+            except BrokenProcessPool:
+                self._pool = None
+                pool = self._get_pool()
+                future = pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the worker is actually free again, which for
+        # a file that timed out is when _recycle has killed its worker.
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda _: self._release_slot(loop))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self._recycle(pool)
+            raise
+        except BrokenProcessPool:
+            if self._pool is pool:
+                self._pool = None
+            if pool in self._recycled:
+                raise _Recycled() from None
+            raise
+
+    def _recycle(self, pool: ProcessPoolExecutor) -> None:
+        """Kill the workers of `pool`, one of which is stuck on a file that timed out."""
+        if pool in self._recycled:
+            return
+        self._recycled.add(pool)
+        if self._pool is pool:
+            self._pool = None
+        kill_pool(pool)
+
+    def _release_slot(self, loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            loop.call_soon_threadsafe(self._slots.release)
+        except RuntimeError:
+            # The event loop is already closed, nobody is waiting for the slot
+            pass
+
+    async def start(self, fn: Callable[[], Any]) -> List[Any]:
+        """
+        Spawn all workers now instead of on first use: submits fn once per
+        worker (each new worker runs the initializer first) and returns the
+        results. Which worker runs which call is up to the pool.
+        """
+        return await self.map(fn, [()] * self.workers)
+
+    async def map(self, fn: Callable[..., Any], items: List[tuple]) -> List[Any]:
+        """Run fn(*item) for every item concurrently, returning results in input order."""
+        return await asyncio.gather(*(self.run(fn, *item) for item in items))
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+class FileBatcher:
+    """
+    Groups single-file submissions into batch calls on a DetectionExecutor.
+    Files submitted during the same event loop iteration with the same
+    options are collected, split into at most one chunk per worker (of at
+    most `max_files` files) and each chunk runs as one
+    batch_fn(filenames, contents, options) call. batch_fn returns one
+    result or exception per file, which is handed back to that file's caller.
+    Calls go through `run` (default: executor.run), which may wrap them.
+    """
+
+    def __init__(self, executor: DetectionExecutor, batch_fn: Callable[..., List[Any]],
+                 max_files: int = BATCH_MAX_FILES, run: Optional[Callable[..., Awaitable[Any]]] = None):
+        self.executor = executor
+        self.batch_fn = batch_fn
+        self.run_fn = run or executor.run
+        self.max_files = max(1, max_files)
+        self.batches = 0
+        self._pending: Dict[str, Tuple[Dict[str, Any], List[tuple]]] = {}
+
+    async def run(self, filename: str, content: bytes, options: Dict[str, Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        if not self._pending:
+            loop.call_soon(self._flush)
+        group = self._pending.setdefault(json.dumps(options, sort_keys=True), (options, []))
+        future = loop.create_future()
+        group[1].append((filename, content, future))
+        return await future
+
+    def _flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        for options, entries in pending.values():
+            size = min(self.max_files, math.ceil(len(entries) / self.executor.workers))
+            for start in range(0, len(entries), size):
+                asyncio.ensure_future(self._run_chunk(entries[start:start + size], options))
+
+    async def _run_chunk(self, entries: List[tuple], options: Dict[str, Any]) -> None:
+        entries = [entry for entry in entries if not entry[2].done()]
+        if not entries:
+            return
+        self.batches += 1
+        try:
+            results = await self.run_fn(
+                self.batch_fn, [entry[0] for entry in entries], [entry[1] for entry in entries], options
+            )
+        except Exception as error:
+            results = [error] * len(entries)
+        for (_, _, future), result in zip(entries, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,280 @@
+import asyncio
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Job store location and limits, overridable through the environment
+JOBS_DB_PATH = os.environ.get("COLOR_JOBS_DB", "jobs.sqlite3")
+# Upper bound for the per-job concurrency a client may ask for
+JOB_MAX_CONCURRENCY = int(os.environ.get("COLOR_JOB_MAX_CONCURRENCY", "8"))
+
+# Job and file states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, CANCELLED)
+
+Runner = Callable[[str, bytes, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def _locked(method: Callable[..., Any]) -> Callable[..., Any]:
+    @functools.wraps(method)
+    def call(self: "JobStore", *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return call
+
+
+class JobStore:
+    """
+    SQLite persistence for jobs and their files. Uploaded bytes are kept
+    until their file is processed, so unfinished jobs survive a restart.
+    Calls may come from any thread; they are serialized on one connection.
+    """
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                options TEXT NOT NULL,
+                concurrency INTEGER NOT NULL,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_files (
+                job_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                filename TEXT NOT NULL,
+                content BLOB,
+                status TEXT NOT NULL,
+                result TEXT,
+                PRIMARY KEY (job_id, idx)
+            );
+            """
+        )
+        self._db.commit()
+
+    @_locked
+    def create(self, files: List[tuple], options: Dict[str, Any], concurrency: int) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._db.execute(
+            "INSERT INTO jobs (id, status, options, concurrency, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, json.dumps(options), concurrency, now, now),
+        )
+        self._db.executemany(
+            "INSERT INTO job_files (job_id, idx, filename, content, status) VALUES (?, ?, ?, ?, ?)",
+            [(job_id, index, filename, content, QUEUED) for index, (filename, content) in enumerate(files)],
+        )
+        self._db.commit()
+        return job_id
+
+    @_locked
+    def job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._db.execute(
+            "SELECT status, options, concurrency, created, updated FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        status, options, concurrency, created, updated = row
+        return {
+            "id": job_id,
+            "status": status,
+            "options": json.loads(options),
+            "concurrency": concurrency,
+            "created": created,
+            "updated": updated,
+        }
+
+    @_locked
+    def files(self, job_id: str) -> List[Dict[str, Any]]:
+        rows = self._db.execute(
+            "SELECT idx, filename, status, result FROM job_files WHERE job_id = ? ORDER BY idx", (job_id,)
+        ).fetchall()
+        return [
+            {"index": idx, "filename": filename, "status": status, "result": json.loads(result) if result else None}
+            for idx, filename, status, result in rows
+        ]
+
+    @_locked
+    def queued_files(self, job_id: str) -> List[tuple]:
+        return self._db.execute(
+            "SELECT idx, filename, content FROM job_files WHERE job_id = ? AND status = ? ORDER BY idx",
+            (job_id, QUEUED),
+        ).fetchall()
+
+    @_locked
+    def unfinished_jobs(self) -> List[str]:
+        rows = self._db.execute("SELECT id FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchall()
+        return [row[0] for row in rows]
+
+    @_locked
+    def set_job_status(self, job_id: str, status: str) -> None:
+        self._db.execute("UPDATE jobs SET status = ?, updated = ? WHERE id = ?", (status, time.time(), job_id))
+        self._db.commit()
+
+    @_locked
+    def set_file_status(self, job_id: str, index: int, status: str, result: Optional[Dict[str, Any]] = None) -> None:
+        if status in (DONE, FAILED, CANCELLED):
+            # The upload is no longer needed once the file has an outcome
+            self._db.execute(
+                "UPDATE job_files SET status = ?, result = ?, content = NULL WHERE job_id = ? AND idx = ?",
+                (status, json.dumps(result) if result is not None else None, job_id, index),
+            )
+        else:
+            self._db.execute(
+                "UPDATE job_files SET status = ? WHERE job_id = ? AND idx = ?", (status, job_id, index)
+            )
+        self._db.execute("UPDATE jobs SET updated = ? WHERE id = ?", (time.time(), job_id))
+        self._db.commit()
+
+    @_locked
+    def requeue_running(self, job_id: str) -> None:
+        self._db.execute(
+            "UPDATE job_files SET status = ? WHERE job_id = ? AND status = ?", (QUEUED, job_id, RUNNING)
+        )
+        self._db.commit()
+
+    @_locked
+    def cancel_queued(self, job_id: str) -> None:
+        self._db.execute(
+            "UPDATE job_files SET status = ?, content = NULL WHERE job_id = ? AND status IN (?, ?)",
+            (CANCELLED, job_id, QUEUED, RUNNING),
+        )
+        self._db.commit()
+
+    @_locked
+    def close(self) -> None:
+        self._db.close()
+
+
+class JobManager:
+    """
+    Runs stored jobs on the event loop, handing each file to `runner`
+    (normally the cached worker-pool pipeline) with at most the job's
+    concurrency in flight. Unfinished jobs are resumed by start().
+    Store calls run in a thread: writing or reading a job's uploads can
+    take seconds, which must not stall the event loop.
+    """
+
+    def __init__(self, store: JobStore, runner: Runner):
+        self.store = store
+        self.runner = runner
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._changed: Dict[str, asyncio.Event] = {}
+
+    async def _store(self, method: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.to_thread(method, *args)
+
+    async def start(self) -> None:
+        for job_id in await self._store(self.store.unfinished_jobs):
+            await self._store(self.store.requeue_running, job_id)
+            self._spawn(job_id)
+
+    async def submit(self, files: List[tuple], options: Dict[str, Any], concurrency: int) -> str:
+        concurrency = max(1, min(concurrency, JOB_MAX_CONCURRENCY))
+        job_id = await self._store(self.store.create, files, options, concurrency)
+        self._spawn(job_id)
+        return job_id
+
+    def _spawn(self, job_id: str) -> None:
+        self._tasks[job_id] = asyncio.ensure_future(self._run(job_id))
+
+    def _notify(self, job_id: str) -> None:
+        event = self._changed.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _run(self, job_id: str) -> None:
+        job = await self._store(self.store.job, job_id)
+        await self._store(self.store.set_job_status, job_id, RUNNING)
+        slots = asyncio.Semaphore(job["concurrency"])
+
+        async def run_file(index: int, filename: str, content: bytes) -> None:
+            async with slots:
+                await self._store(self.store.set_file_status, job_id, index, RUNNING)
+                try:
+                    result = await self.runner(filename, content, job["options"])
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    message = "Processing timed out" if isinstance(e, asyncio.TimeoutError) else str(e) or type(e).__name__
+                    await self._store(
+                        self.store.set_file_status, job_id, index, FAILED, {"filename": filename, "error": message}
+                    )
+                else:
+                    await self._store(self.store.set_file_status, job_id, index, DONE, dict(result, filename=filename))
+                self._notify(job_id)
+
+        try:
+            queued = await self._store(self.store.queued_files, job_id)
+            await asyncio.gather(*(run_file(*row) for row in queued))
+            await self._store(self.store.set_job_status, job_id, DONE)
+        finally:
+            self._tasks.pop(job_id, None)
+            self._notify(job_id)
+
+    async def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self._store(self.store.job, job_id)
+        if job is None:
+            return None
+        files = await self._store(self.store.files, job_id)
+        counts = {state: 0 for state in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+        for file in files:
+            counts[file["status"]] += 1
+        finished = counts[DONE] + counts[FAILED] + counts[CANCELLED]
+        job.update(
+            total=len(files),
+            counts=counts,
+            progress=finished / len(files) if files else 1.0,
+            files=files,
+        )
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Long-poll: return once the job finishes or `timeout` seconds pass."""
+        deadline = time.monotonic() + timeout
+        while True:
+            # Registered before the status read, so a change that lands while
+            # status() runs in its thread still wakes this waiter
+            event = self._changed.setdefault(job_id, asyncio.Event())
+            job = await self.status(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in FINISHED_STATES or remaining <= 0:
+                return job
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self._store(self.store.job, job_id)
+        if job is None:
+            return None
+        if job["status"] not in FINISHED_STATES:
+            task = self._tasks.pop(job_id, None)
+            if task is not None:
+                task.cancel()
+            await self._store(self.store.cancel_queued, job_id)
+            await self._store(self.store.set_job_status, job_id, CANCELLED)
+            self._notify(job_id)
+        return await self.status(job_id)
+
+    def shutdown(self) -> None:
+        # Running jobs stay "running" in the store and are resumed on start()
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        self.store.close()
@@ -0,0 +1,60 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# Stage latency buckets from sub-millisecond SVG parses to slow Ghostscript renders
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    "color_stage_seconds",
+    "Time spent in each processing stage",
+    ["stage", "format", "backend"],
+    buckets=STAGE_BUCKETS,
+)
+FILES = Counter("color_files_total", "Files received for detection", ["format"])
+BYTES = Counter("color_bytes_total", "Bytes of files received for detection", ["format"])
+FAILURES = Counter("color_failures_total", "Files that failed processing", ["format"])
+
+
+@contextmanager
+def timed(info: Optional[Dict[str, Any]], stage: str) -> Iterator[None]:
+    """
+    Add the time spent in the block to info["timings"][stage], in seconds.
+    Repeated stages (e.g. clustering several embedded images) accumulate.
+    Does nothing when info is None.
+    """
+    if info is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = info.setdefault("timings", {})
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def format_label(ext: str) -> str:
+    return ext.lstrip(".").lower() or "unknown"
+
+
+def record_file(ext: str, size: int) -> None:
+    FILES.labels(format_label(ext)).inc()
+    BYTES.labels(format_label(ext)).inc(size)
+
+
+def record_failure(ext: str) -> None:
+    FAILURES.labels(format_label(ext)).inc()
+
+
+def record_timings(ext: str, timings: Dict[str, float], backend: Optional[str] = None) -> None:
+    label = format_label(ext)
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.labels(stage, label, backend or "none").observe(seconds)
+
+
+def render() -> tuple:
+    """The current metrics in the Prometheus text format, with its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,432 @@
+import base64
+import math
+import os
+from io import BytesIO
+from typing import Dict, Any, List, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+from color_detection import RASTER_EXTENSIONS, TILED_PIXELS, count_colors_batch, detect_colors, extract_pdf_colors, merge_tallied, tally_palette
+from converters import RENDER_PIXELS, _pixmap_to_array, pdf_page_count, render_pdf, render_vector, sniff_format
+from metrics import timed
+
+VECTOR_EXTENSIONS = ('.pdf', '.ai', '.eps', '.epm')
+# Preview options: "none" omits it, "thumb" is bounded by PREVIEW_MAX_EDGE,
+# "full" is the complete render as PNG
+PREVIEW_MODES = ("none", "thumb", "full")
+PREVIEW_MAX_EDGE = int(os.environ.get("COLOR_PREVIEW_MAX_EDGE", "256"))
+PREVIEW_FORMAT = os.environ.get("COLOR_PREVIEW_FORMAT", "webp").lower()
+# Upper bound on the pages processed per PDF/AI file, whatever "pages" asks for
+MAX_PAGES = int(os.environ.get("COLOR_MAX_PAGES", "100"))
+
+
+def output_settings() -> Dict[str, Any]:
+    """Server-side settings that change what process_file returns, for cache keys."""
+    return {
+        "render_pixels": RENDER_PIXELS,
+        "preview_max_edge": PREVIEW_MAX_EDGE,
+        "preview_format": PREVIEW_FORMAT,
+    }
+
+
+def _decode_raster_image(content: bytes, pixel_budget: Optional[int] = None,
+                         info: Optional[Dict[str, Any]] = None) -> Union[np.ndarray, Image.Image]:
+    """
+    Decode raster images (.png, .jpg, .jpeg) once, straight into the array
+    passed to detect_colors:
+    - JPEGs larger than `pixel_budget` pixels are decoded at the smallest
+      DCT scale (1/2, 1/4 or 1/8, see Image.draft) that still holds that
+      many; the share of the original pixels decoded is stored in
+      info["decoded_share"]
+    - The decoded image is normalized to RGB or RGBA with _pixel_array, so
+      transparent pixels stay transparent
+    Returns an (H, W, 3) or (H, W, 4) uint8 array. Images over TILED_PIXELS
+    are returned as the opened PIL image instead, for tiled detection
+    without a full-size converted copy.
+    """
+    img = Image.open(BytesIO(content))
+    original_pixels = img.width * img.height
+    if pixel_budget and img.format == 'JPEG' and original_pixels > pixel_budget:
+        scale = math.sqrt(pixel_budget / original_pixels)
+        img.draft(img.mode, (math.ceil(img.width * scale), math.ceil(img.height * scale)))
+        if info is not None and img.width * img.height < original_pixels:
+            info["decoded_share"] = img.width * img.height / original_pixels
+    if img.width * img.height > TILED_PIXELS:
+        return img
+    return _pixel_array(img)
+
+
+def _draft_budget(options: Dict[str, Any]) -> Optional[int]:
+    """
+    Pixels a JPEG may be reduced to while decoding: sampling clusters at
+    most max_pixels pixels, so a smaller DCT decode is enough. Not when
+    min_share guarantees minority colors, because the reduced decode blurs
+    thin details into other colors.
+    """
+    if options.get("sample") and not options.get("min_share", 0.001):
+        return options.get("max_pixels", 250_000)
+    return None
+
+
+def _undraft(info: Dict[str, Any], content: bytes, source: Any, preview: str) -> Any:
+    """
+    After detection on a reduced JPEG decode: report "sampled_fraction"
+    against the original pixel count, and return the pixels the preview is
+    built from, decoding the full image again for preview="full".
+    """
+    decoded_share = info.pop("decoded_share", None)
+    if decoded_share is None:
+        return source
+    info["sampled_fraction"] = info.get("sampled_fraction", 1.0) * decoded_share
+    return _decode_raster_image(content) if preview == "full" else source
+
+
+def _pixel_array(img: Image.Image) -> np.ndarray:
+    """
+    Convert a PIL image to an RGB or RGBA uint8 array in NumPy, without an
+    intermediate converted PIL image:
+    - RGB/RGBA as decoded, L/LA with the gray value in every color channel
+    - RGB and L with a "transparency" color key (PNG tRNS) as RGBA, with the
+      key color transparent
+    - P through its palette, with alpha if the palette or "transparency" has it
+    - CMYK with PIL's own formula, 255 - min(255, C + K) per channel
+    Other modes (1, I;16, PA, ...) fall back to PIL's convert.
+    """
+    mode = img.mode
+    transparency = img.info.get('transparency')
+    if mode in ('RGB', 'L') and transparency is not None:
+        pixels = np.asarray(img)
+        if mode == 'L':
+            keyed = pixels == transparency
+            pixels = np.repeat(pixels[:, :, None], 3, axis=2)
+        else:
+            keyed = (pixels == np.array(transparency, dtype=pixels.dtype)).all(axis=2)
+        return np.dstack([pixels, np.where(keyed, 0, 255).astype(np.uint8)])
+    if mode in ('RGB', 'RGBA'):
+        return np.asarray(img)
+    if mode == 'L':
+        return np.repeat(np.asarray(img)[:, :, None], 3, axis=2)
+    if mode == 'LA':
+        return np.asarray(img)[:, :, [0, 0, 0, 1]]
+    if mode == 'P':
+        return _palette_lut(img)[np.asarray(img)]
+    if mode == 'CMYK':
+        cmyk = np.asarray(img)
+        # 255 - min(255, C + K) == (255 - K) - min(C, 255 - K), without leaving uint8
+        inverse_k = 255 - cmyk[:, :, 3:]
+        return inverse_k - np.minimum(cmyk[:, :, :3], inverse_k)
+    has_alpha = 'A' in mode or transparency is not None
+    return np.asarray(img.convert('RGBA' if has_alpha else 'RGB'))
+
+
+def _palette_lut(img: Image.Image) -> np.ndarray:
+    """The palette of a P image as a (256, 3) RGB or (256, 4) RGBA lookup table."""
+    palette_mode = 'RGBA' if img.palette.mode == 'RGBA' else 'RGB'
+    channels = len(palette_mode)
+    entries = np.array(img.getpalette(palette_mode), dtype=np.uint8).reshape(-1, channels)[:256]
+    lut = np.zeros((256, channels), dtype=np.uint8)
+    lut[:len(entries)] = entries
+    transparency = img.info.get('transparency')
+    if transparency is None:
+        return lut
+    if channels == 3:
+        lut = np.concatenate([lut, np.full((256, 1), 255, dtype=np.uint8)], axis=1)
+    if isinstance(transparency, bytes):
+        alpha = np.frombuffer(transparency, dtype=np.uint8)[:256]
+        lut[:len(alpha), 3] = alpha
+    else:
+        lut[transparency, 3] = 0
+    return lut
+
+
+def _encode_image(image: Image.Image, fmt: str) -> bytes:
+    buffer = BytesIO()
+    if fmt == 'webp':
+        image.save(buffer, format='WEBP', quality=80)
+    else:
+        image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _thumbnail(pixels: Union[np.ndarray, Image.Image], max_edge: int = PREVIEW_MAX_EDGE, fmt: str = PREVIEW_FORMAT) -> bytes:
+    """Downscale a decoded pixel array or PIL image so its longest edge is at most max_edge."""
+    if isinstance(pixels, Image.Image):
+        # Resize into a new image rather than copying a huge source for thumbnail()
+        scale = min(1.0, max_edge / max(pixels.size))
+        size = (max(1, round(pixels.width * scale)), max(1, round(pixels.height * scale)))
+        image = pixels.resize(size, Image.LANCZOS, reducing_gap=2.0)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+    else:
+        image = Image.fromarray(pixels)
+        image.thumbnail((max_edge, max_edge))
+    return _encode_image(image, fmt)
+
+
+def _render_document_thumbnail(content: bytes, filetype: str, max_edge: int = PREVIEW_MAX_EDGE) -> np.ndarray:
+    """Render the first page of an SVG or PDF straight at thumbnail size."""
+    import fitz  # PyMuPDF, imported on first use
+
+    doc = fitz.open(stream=content, filetype=filetype)
+    try:
+        page = doc[0]
+        scale = max_edge / max(page.rect.width, page.rect.height, 1)
+        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=True)
+        return _pixmap_to_array(pix)
+    finally:
+        doc.close()
+
+
+def _build_preview(ext: str, content: bytes, source: Any, mode: str) -> Optional[str]:
+    """
+    Build the data URI preview for a processed file:
+    - "none": no preview
+    - "thumb": a PREVIEW_MAX_EDGE thumbnail in PREVIEW_FORMAT, made from the
+      already decoded pixels (SVGs are rendered small with PyMuPDF and fall
+      back to their own markup if that fails)
+    - "full": the SVG markup, or the full decoded image as PNG
+    Vector-mode PDFs have no decoded pixels, so they are rendered here at
+    the size the preview needs.
+    """
+    if mode == 'none':
+        return None
+    if source is None:
+        source = render_pdf(content) if mode == 'full' else _render_document_thumbnail(content, "pdf")
+    if ext == '.svg':
+        if mode == 'thumb':
+            try:
+                pixels = _render_document_thumbnail(content, "svg")
+                return f"data:image/{PREVIEW_FORMAT};base64," + base64.b64encode(_thumbnail(pixels)).decode()
+            except Exception:
+                pass
+        return "data:image/svg+xml;base64," + base64.b64encode(content).decode()
+    if not isinstance(source, (np.ndarray, Image.Image)):
+        return "data:image/png;base64," + base64.b64encode(content).decode()
+    if mode == 'thumb':
+        return f"data:image/{PREVIEW_FORMAT};base64," + base64.b64encode(_thumbnail(source)).decode()
+    image = source if isinstance(source, Image.Image) else Image.fromarray(source)
+    if image.mode == 'CMYK':
+        image = image.convert('RGB')
+    return "data:image/png;base64," + base64.b64encode(_encode_image(image, 'png')).decode()
+
+
+def process_file(filename: str, content: bytes, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the full convert-and-detect pipeline for one uploaded file.
+    This is the unit of work handed to the process pool, so it only takes
+    picklable arguments and never touches the filesystem:
+    - Render PDF/AI/EPS through the converter dispatch, or decode raster
+      images, into a pixel array
+    - Detect colors with the raster options in `options`
+    - Build the requested preview from the same pixel array
+    `options` also carries the pipeline settings "preview" (see
+    PREVIEW_MODES, default "thumb") and "mode". With mode="vector",
+    PDF-based files (PDF and PDF-compatible AI) skip rendering and read
+    exact colors from the page content instead; they fall back to the
+    raster path if that yields nothing or fails.
+    "pages" and "stable_pages" select multi-page processing of PDF-based
+    files, see requested_pages and PageMerger; pages run one after the
+    other here, the server spreads them over its pool with process_page.
+    The result also carries per-stage seconds in "timings" and, for
+    rendered vector files, the converter used in "backend".
+    """
+    total = requested_pages(filename, content, options)
+    if total == 1:
+        return process_page(filename, content, 0, options)
+    merger = PageMerger(filename, options, total)
+    for page_index in range(total):
+        if merger.add(process_page(filename, content, page_index, options)):
+            break
+    return merger.result()
+
+
+def requested_pages(filename: str, content: bytes, options: Dict[str, Any]) -> int:
+    """
+    Number of pages to process: 1 unless the file is PDF-based and
+    options["pages"] asks for more (0 means every page), capped by MAX_PAGES.
+    """
+    pages = options.get("pages", 1)
+    ext = os.path.splitext(filename)[1].lower()
+    if pages == 1 or ext not in VECTOR_EXTENSIONS or sniff_format(content) != "pdf":
+        return 1
+    try:
+        count = pdf_page_count(content)
+    except Exception:
+        return 1
+    return max(1, min(count, pages or count, MAX_PAGES))
+
+
+def process_page(filename: str, content: bytes, page_index: int, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Detect colors on one page of a file; only the first page builds a preview."""
+    options = dict(options)
+    preview = options.pop("preview", "thumb")
+    if page_index:
+        preview = "none"
+    mode = options.pop("mode", "raster")
+    options.pop("pages", None)
+    options.pop("stable_pages", None)
+    ext = os.path.splitext(filename)[1].lower()
+    info: Dict[str, Any] = {}
+    with timed(info, "total"):
+        if mode == "vector" and ext in VECTOR_EXTENSIONS and sniff_format(content) == "pdf":
+            try:
+                with timed(info, "vector_extract"):
+                    count, colors = extract_pdf_colors(content, page_index=page_index, info=info, **options)
+            except Exception:
+                count = 0
+            if count:
+                with timed(info, "preview"):
+                    preview_uri = _build_preview(ext, content, None, preview)
+                return _result(filename, count, colors, preview_uri, info)
+
+        if ext in VECTOR_EXTENSIONS:
+            source = render_vector(content, info=info, page_index=page_index)
+        elif ext in RASTER_EXTENSIONS:
+            with timed(info, "decode"):
+                source = _decode_raster_image(content, _draft_budget(options), info)
+        else:
+            source = content
+
+        count, colors = detect_colors(source, ext=ext, info=info, **options)
+        with timed(info, "preview"):
+            preview_uri = _build_preview(ext, content, _undraft(info, content, source, preview), preview)
+    return _result(filename, count, colors, preview_uri, info)
+
+
+def process_batch(filenames: List[str], contents: List[bytes], options: Dict[str, Any]) -> List[Any]:
+    """
+    Run many small raster files through one worker call: each is decoded
+    and its preview built as in process_page, so fixed per-file overhead is
+    paid once. With engine="histogram" colors are detected for all of them
+    together with count_colors_batch, which gives the same palettes as one
+    file at a time; every result's "timings" then includes an even share
+    of the batch's clustering time. The kmeans engine refines on every
+    pixel of each image, so those files are clustered one by one to keep
+    their palettes independent of how they were submitted.
+    Returns one result per file, in order, or the exception that file
+    raised, so one bad upload doesn't fail the rest.
+    """
+    options = dict(options)
+    preview = options.pop("preview", "thumb")
+    for key in ("mode", "pages", "stable_pages"):
+        options.pop(key, None)
+    pixel_budget = _draft_budget(options)
+
+    results: List[Any] = [None] * len(filenames)
+    decoded = []
+    for index, content in enumerate(contents):
+        info: Dict[str, Any] = {}
+        try:
+            with timed(info, "decode"):
+                decoded.append((index, _decode_raster_image(content, pixel_budget, info), info))
+        except Exception as e:
+            results[index] = e
+    if options.get("engine", "kmeans") == "histogram":
+        palettes = count_colors_batch(
+            [source for _, source, _ in decoded], infos=[info for _, _, info in decoded], **options
+        )
+    else:
+        palettes = []
+        for _, source, info in decoded:
+            try:
+                palettes.append(detect_colors(source, info=info, **options))
+            except Exception as e:
+                palettes.append(e)
+    for (index, source, info), palette in zip(decoded, palettes):
+        if isinstance(palette, Exception):
+            results[index] = palette
+            continue
+        count, colors = palette
+        ext = os.path.splitext(filenames[index])[1].lower()
+        try:
+            with timed(info, "preview"):
+                preview_source = _undraft(info, contents[index], source, preview)
+                preview_uri = _build_preview(ext, contents[index], preview_source, preview)
+        except Exception as e:
+            results[index] = e
+            continue
+        timings = info.setdefault("timings", {})
+        timings["total"] = sum(timings.values())
+        results[index] = _result(filenames[index], count, colors, preview_uri, info)
+    return results
+
+
+class PageMerger:
+    """
+    Combines per-page results, added in page order, into one document
+    result: the merged palette (see merge_palettes) in "count"/"colors",
+    the first page's preview, the per-page palettes in "pages" and summed
+    "timings". add() returns True once no further pages are needed: all
+    `total` pages are in or, with options["stable_pages"] = N, the merged
+    palette went N pages without changing. Pages added after that are
+    ignored. Palettes are tallied as they arrive, and the merged palette is
+    only recomputed per page when stable_pages needs the comparison.
+    """
+
+    def __init__(self, filename: str, options: Dict[str, Any], total: int):
+        self.filename = filename
+        self.stable_pages = options.get("stable_pages", 0)
+        self.total = total
+        self.pages: List[Dict[str, Any]] = []
+        self.stopped = False
+        self._seen: Dict[str, tuple] = {}
+        self._merged: Optional[set] = None
+        self._unchanged = 0
+
+    def add(self, page: Dict[str, Any]) -> bool:
+        if self.stopped:
+            return True
+        tally_palette(self._seen, set(page["colors"]), len(self.pages))
+        self.pages.append(page)
+        if self.stable_pages:
+            merged = merge_tallied(self._seen)
+            self._unchanged = self._unchanged + 1 if merged == self._merged else 0
+            self._merged = merged
+            if self._unchanged >= self.stable_pages:
+                self.stopped = True
+        else:
+            self._merged = None
+        self.stopped = self.stopped or len(self.pages) >= self.total
+        return self.stopped
+
+    def result(self) -> Dict[str, Any]:
+        if self._merged is None:
+            self._merged = merge_tallied(self._seen)
+        pages = self.pages
+        timings: Dict[str, float] = {}
+        for page in pages:
+            for stage, seconds in page.get("timings", {}).items():
+                timings[stage] = timings.get(stage, 0.0) + seconds
+        result = {
+            "filename": self.filename,
+            "count": len(self._merged),
+            "colors": sorted(self._merged),
+            "preview": pages[0]["preview"],
+            "pages_requested": self.total,
+            "pages": [
+                {"page": number + 1, "count": page["count"], "colors": page["colors"]}
+                for number, page in enumerate(pages)
+            ],
+            "timings": timings,
+        }
+        if "backend" in pages[0]:
+            result["backend"] = pages[0]["backend"]
+        return result
+
+
+def _result(filename: str, count: int, colors: set, preview: Optional[str], info: Dict[str, Any]) -> Dict[str, Any]:
+    result = {
+        "filename": filename,
+        "count": count,
+        "colors": list(colors),
+        "preview": preview
+    }
+    if "sampled_fraction" in info:
+        result["sampled_fraction"] = info["sampled_fraction"]
+    # Stage timings and the render backend, for metrics; callers strip them
+    # unless the client asked for timings
+    result["timings"] = info.get("timings", {})
+    if "backend" in info:
+        result["backend"] = info["backend"]
+    return result
@@ -0,0 +1,245 @@
+import cProfile
+import glob
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Saved profiles and their metadata, overridable through the environment
+PROFILE_DIR = os.path.abspath(os.environ.get("COLOR_PROFILE_DIR", "profiles"))
+# Profile every worker call with the sampler and keep those slower than
+# this many seconds (0 disables the rule)
+PROFILE_SLOWER_THAN = float(os.environ.get("COLOR_PROFILE_SLOWER_THAN", "0"))
+# Seconds between stack samples of the "sample" profiler
+PROFILE_INTERVAL = float(os.environ.get("COLOR_PROFILE_INTERVAL", "0.005"))
+# Oldest profiles are deleted beyond this many
+PROFILE_MAX_FILES = int(os.environ.get("COLOR_PROFILE_MAX_FILES", "200"))
+# A sampled call still running past its min_seconds has its profile saved
+# every this many seconds, so a call the executor kills at COLOR_FILE_TIMEOUT
+# still leaves the stacks recorded up to its last checkpoint
+PROFILE_CHECKPOINT = float(os.environ.get("COLOR_PROFILE_CHECKPOINT", "5"))
+# Functions listed in a profile summary
+PROFILE_TOP = 15
+
+# "cprofile" is deterministic and saved as pstats; "sample" records the
+# stack every PROFILE_INTERVAL and is saved in the speedscope format
+PROFILERS = ("cprofile", "sample")
+_EXTENSIONS = {"cprofile": ".pstats", "sample": ".speedscope.json"}
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class StackSampler:
+    """
+    Small sampling profiler: a daemon thread records the Python stack of
+    the thread that entered it every `interval` seconds. Each sample is
+    weighted by the time since the previous one, so stretches where a C
+    extension held the GIL are still charged to the stack that ran them.
+    With `checkpoint` set, the sampling thread calls checkpoint(seconds)
+    once `checkpoint_after` seconds have passed and every
+    `checkpoint_every` seconds after that.
+    """
+
+    def __init__(
+        self,
+        interval: float = PROFILE_INTERVAL,
+        checkpoint: Optional[Callable[[float], Any]] = None,
+        checkpoint_after: float = 0.0,
+        checkpoint_every: float = PROFILE_CHECKPOINT,
+    ):
+        self.interval = interval
+        self.checkpoint = checkpoint
+        self.checkpoint_after = checkpoint_after
+        self.checkpoint_every = checkpoint_every
+        self.frames: Dict[Tuple[str, str, int], int] = {}
+        self.samples: List[List[int]] = []
+        self.weights: List[float] = []
+        self._target = threading.get_ident()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "StackSampler":
+        self._target = threading.get_ident()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        start = last = time.perf_counter()
+        next_checkpoint = self.checkpoint_after
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            now = time.perf_counter()
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                key = (code.co_name, code.co_filename, code.co_firstlineno)
+                stack.append(self.frames.setdefault(key, len(self.frames)))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+            self.weights.append(now - last)
+            last = now
+            if self.checkpoint is not None and now - start >= next_checkpoint:
+                self.checkpoint(now - start)
+                next_checkpoint = now - start + self.checkpoint_every
+
+    def top(self, n: int = PROFILE_TOP) -> List[Dict[str, Any]]:
+        """The n functions with the most self time, with their total (inclusive) time."""
+        self_time: Dict[int, float] = {}
+        total_time: Dict[int, float] = {}
+        for stack, weight in zip(self.samples, self.weights):
+            self_time[stack[-1]] = self_time.get(stack[-1], 0.0) + weight
+            for frame in set(stack):
+                total_time[frame] = total_time.get(frame, 0.0) + weight
+        names = {index: key for key, index in self.frames.items()}
+        ranked = sorted(total_time, key=lambda frame: (self_time.get(frame, 0.0), total_time[frame]), reverse=True)
+        return [_entry(*names[frame], self_time.get(frame, 0.0), total_time[frame]) for frame in ranked[:n]]
+
+    def speedscope(self, name: str) -> Dict[str, Any]:
+        frames = sorted(self.frames.items(), key=lambda item: item[1])
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "shared": {"frames": [{"name": fn, "file": path, "line": line} for (fn, path, line), _ in frames]},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(self.weights),
+                "samples": self.samples,
+                "weights": self.weights,
+            }],
+        }
+
+
+def _entry(function: str, path: str, line: int, self_seconds: float, total_seconds: float) -> Dict[str, Any]:
+    # cProfile reports C functions with path "~" and line 0
+    label = function if path == "~" else f"{function} ({os.path.basename(path)}:{line})"
+    return {
+        "function": label,
+        "self_seconds": round(self_seconds, 6),
+        "total_seconds": round(total_seconds, 6),
+    }
+
+
+def _cprofile_top(profile: cProfile.Profile, n: int = PROFILE_TOP) -> List[Dict[str, Any]]:
+    stats = pstats.Stats(profile).stats
+    ranked = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)
+    return [_entry(name, path, line, tt, ct) for (path, line, name), (_, _, tt, ct, _) in ranked[:n]]
+
+
+def _describe(fn: Callable[..., Any], args: tuple) -> str:
+    names = args[0] if args and isinstance(args[0], list) else list(args[:1])
+    shown = ", ".join(str(name) for name in names[:3])
+    return f"{fn.__name__}({shown}{', ...' if len(names) > 3 else ''})"
+
+
+def run_profiled(profiler: str, min_seconds: float, trigger: str, fn: Callable[..., Any], *args: Any) -> Tuple[Any, Optional[Dict[str, Any]]]:
+    """
+    Worker entry point: call fn(*args) under `profiler` (see PROFILERS) and
+    return (result, summary). If the call took at least `min_seconds` the
+    profile is saved under a new id in PROFILE_DIR and the summary gives the
+    id, format, seconds and the top functions by self time; otherwise the
+    summary is None. A call that raises is still saved when slow enough,
+    then the exception propagates. The "sample" profiler also saves the
+    profile under the same id, marked "partial", at checkpoints while the
+    call runs past `min_seconds`, so a call killed at the file timeout
+    keeps its stacks up to the last PROFILE_CHECKPOINT.
+    """
+    if profiler not in PROFILERS:
+        raise ValueError(f"Unknown profiler: {profiler}")
+    profile_id = uuid.uuid4().hex
+    label = _describe(fn, args)
+    if profiler == "cprofile":
+        profile = cProfile.Profile()
+    else:
+        profile = StackSampler(
+            checkpoint=lambda seconds: _save(profiler, profile, seconds, trigger, label, profile_id, partial=True),
+            checkpoint_after=min_seconds,
+        )
+    start = time.perf_counter()
+    try:
+        if profiler == "cprofile":
+            result = profile.runcall(fn, *args)
+        else:
+            with profile:
+                result = fn(*args)
+    finally:
+        elapsed = time.perf_counter() - start
+        summary = None
+        if elapsed >= min_seconds:
+            summary = _save(profiler, profile, elapsed, trigger, label, profile_id)
+    return result, summary
+
+
+def _save(profiler: str, profile: Any, seconds: float, trigger: str, label: str,
+          profile_id: str, partial: bool = False) -> Dict[str, Any]:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, profile_id + _EXTENSIONS[profiler])
+    # Written aside and renamed, so a worker killed mid-save leaves the last checkpoint intact
+    if profiler == "cprofile":
+        profile.dump_stats(path + ".tmp")
+        top = _cprofile_top(profile)
+    else:
+        with open(path + ".tmp", "w", encoding="utf-8") as output:
+            json.dump(profile.speedscope(label), output)
+        top = profile.top()
+    os.replace(path + ".tmp", path)
+    summary = {"id": profile_id, "format": profiler, "seconds": round(seconds, 6), "top": top}
+    metadata = dict(summary, label=label, trigger=trigger, created=time.time(), partial=partial)
+    metadata_path = os.path.join(PROFILE_DIR, profile_id + ".json")
+    with open(metadata_path + ".tmp", "w", encoding="utf-8") as output:
+        json.dump(metadata, output)
+    os.replace(metadata_path + ".tmp", metadata_path)
+    _prune()
+    return summary
+
+
+def _prune(max_files: int = PROFILE_MAX_FILES) -> None:
+    entries = sorted(glob.glob(os.path.join(PROFILE_DIR, "*.json")), key=os.path.getmtime)
+    entries = [path for path in entries if not path.endswith(".speedscope.json")]
+    for path in entries[:max(0, len(entries) - max_files)]:
+        profile_id = os.path.basename(path)[:-len(".json")]
+        for stale in glob.glob(os.path.join(PROFILE_DIR, profile_id + "*")):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Metadata of the saved profiles, newest first, without their top functions."""
+    profiles = []
+    for path in glob.glob(os.path.join(PROFILE_DIR, "*.json")):
+        if path.endswith(".speedscope.json"):
+            continue
+        try:
+            with open(path, encoding="utf-8") as metadata:
+                entry = json.load(metadata)
+        except (OSError, ValueError):
+            continue
+        entry.pop("top", None)
+        profiles.append(entry)
+    return sorted(profiles, key=lambda entry: entry["created"], reverse=True)
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    """Path of the saved profile file for `profile_id`, or None if there is none."""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    for extension in _EXTENSIONS.values():
+        path = os.path.join(PROFILE_DIR, profile_id + extension)
+        if os.path.exists(path):
+            return path
+    return None
@@ -0,0 +1,131 @@
+"""
+Startup helpers: worker warm-up and import-time diagnostics.
+
+    python startup.py            # import-time report for the app, then a local warm-up
+    python startup.py --top 30 --module pipeline
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+# Print the import-time report when the server starts
+IMPORT_REPORT = os.environ.get("COLOR_IMPORT_REPORT", "0") == "1"
+
+# Seconds spent per backend by warm_up in this process
+WARMUP_SECONDS: Dict[str, float] = {}
+WARMUP_ERRORS: Dict[str, str] = {}
+
+_IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+_SVG = b"""<svg xmlns="http://www.w3.org/2000/svg" width="8" height="8">
+<rect width="8" height="4" fill="#d02020"/><rect y="4" width="8" height="4" fill="#2040d0"/></svg>"""
+
+
+def _tiny_png() -> bytes:
+    from io import BytesIO
+
+    from PIL import Image
+
+    image = Image.new("RGBA", (8, 8), (208, 32, 32, 255))
+    image.paste((32, 64, 208, 255), (0, 4, 8, 8))
+    buffer = BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _tiny_pdf() -> bytes:
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    page = doc.new_page(width=16, height=16)
+    page.draw_rect(fitz.Rect(0, 0, 16, 8), color=None, fill=(0.8, 0.1, 0.1))
+    content = doc.tobytes()
+    doc.close()
+    return content
+
+
+def warm_up() -> None:
+    """
+    Process pool initializer: import the format backends and run a tiny
+    detection through each (k-means on a PNG, SVG parsing and thumbnail,
+    PDF rendering and vector extraction), so the first real file in a new
+    or recycled worker doesn't pay for imports and first-call setup.
+    Seconds per backend end up in WARMUP_SECONDS. A failing backend is
+    recorded in WARMUP_ERRORS and never stops the worker from starting.
+    """
+    from pipeline import process_file
+
+    steps = [
+        ("raster", lambda: process_file("warmup.png", _tiny_png(), {"preview": "thumb"})),
+        ("svg", lambda: process_file("warmup.svg", _SVG, {"preview": "thumb"})),
+        ("pdf", lambda: process_file("warmup.pdf", _tiny_pdf(), {"preview": "none"})),
+        ("pdf_vector", lambda: process_file("warmup.pdf", _tiny_pdf(), {"preview": "none", "mode": "vector"})),
+    ]
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            WARMUP_ERRORS[name] = str(e) or type(e).__name__
+        WARMUP_SECONDS[name] = time.perf_counter() - start
+
+
+def warmup_report() -> Dict[str, Any]:
+    """The warm-up timings of the worker this runs in."""
+    return {"pid": os.getpid(), "seconds": dict(WARMUP_SECONDS), "errors": dict(WARMUP_ERRORS)}
+
+
+def import_report(module: str = "app", top: int = 15) -> List[Dict[str, Any]]:
+    """
+    Import `module` in a fresh interpreter with -X importtime and return the
+    `top` slowest imports by cumulative time, each with its self and
+    cumulative milliseconds and its nesting depth.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    entries = []
+    for line in completed.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append({
+                "module": name,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": (len(indent) - 1) // 2,
+            })
+    entries.sort(key=lambda entry: entry["cumulative_ms"], reverse=True)
+    return entries[:top]
+
+
+def format_import_report(entries: List[Dict[str, Any]]) -> str:
+    lines = [f"{'cumulative ms':>14} {'self ms':>9}  module"]
+    for entry in entries:
+        lines.append(f"{entry['cumulative_ms']:>14.1f} {entry['self_ms']:>9.1f}  {'  ' * entry['depth']}{entry['module']}")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app", help="Module whose import is measured")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    print(format_import_report(import_report(args.module, args.top)))
+    start = time.perf_counter()
+    warm_up()
+    print(f"\nwarm-up {time.perf_counter() - start:.3f}s")
+    for name, seconds in WARMUP_SECONDS.items():
+        error = f"  ({WARMUP_ERRORS[name]})" if name in WARMUP_ERRORS else ""
+        print(f"  {name:<11} {seconds:.3f}s{error}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Pins the palette guarantees the detection paths make to each other:
+- k-means palettes are bit-identical from run to run and process to process
+- the lxml and BeautifulSoup SVG extractors find the same colors
+- tiled mode gives the k-means palettes of the regular path, up to one
+  unit per channel where OpenCV's float32 sums round
+- batched detection gives the palettes of one image at a time, and
+  process_batch those of process_file
+
+    python -m pytest -q
+"""
+import json
+import os
+import subprocess
+import sys
+from io import BytesIO
+
+import numpy as np
+import pytest
+
+from benchmarks.corpus import make_logo
+from benchmarks.svg import make_svg
+from color_detection import SVG_ENGINES, count_colors_batch, count_png_colors, extract_svg_colors
+from pipeline import process_batch, process_file
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _logos():
+    return [make_logo(size, alpha, seed) for seed, (size, alpha) in enumerate([(48, True), (64, False), (96, True), (128, False)])]
+
+
+def _png(image) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("engine", ["kmeans", "histogram"])
+@pytest.mark.parametrize("n_colors", [5, "auto"])
+def test_palette_is_identical_across_runs_and_processes(engine, n_colors):
+    pixels = np.asarray(make_logo(256, True, seed=7))
+    first = count_png_colors(pixels, n_colors=n_colors, engine=engine)
+    assert count_png_colors(pixels.copy(), n_colors=n_colors, engine=engine) == first
+
+    code = (
+        "import json, numpy as np\n"
+        "from benchmarks.corpus import make_logo\n"
+        "from color_detection import count_png_colors\n"
+        f"count, colors = count_png_colors(np.asarray(make_logo(256, True, seed=7)), n_colors={n_colors!r}, engine={engine!r})\n"
+        "print(json.dumps([count, sorted(colors)]))\n"
+    )
+    env = dict(os.environ, PYTHONHASHSEED="123")
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    # PyMuPDF may print a deprecation notice to stdout first
+    assert json.loads(output.stdout.splitlines()[-1]) == [first[0], sorted(first[1])]
+
+
+@pytest.mark.parametrize("n_elements", [0, 10, 2000])
+def test_svg_engines_agree(n_elements):
+    svg = make_svg(n_elements, seed=n_elements)
+    results = {engine: extract_svg_colors(svg, engine=engine) for engine in SVG_ENGINES}
+    first = results[SVG_ENGINES[0]]
+    for engine in SVG_ENGINES[1:]:
+        assert results[engine][0] == first[0]
+        assert set(results[engine][1]) == set(first[1])
+
+
+@pytest.mark.parametrize("engine", ["kmeans", "histogram"])
+@pytest.mark.parametrize("n_colors", [5, "auto"])
+def test_batch_matches_single_images(engine, n_colors):
+    images = [np.asarray(logo) for logo in _logos()]
+    batch = count_colors_batch(images, n_colors=n_colors, engine=engine)
+    assert batch == [count_png_colors(image, n_colors=n_colors, engine=engine) for image in images]
+
+
+def _rgb(label):
+    return (255, 255, 255) if label == "white" else tuple(int(label[i:i + 2], 16) for i in (1, 3, 5))
+
+
+@pytest.mark.parametrize("n_colors", [3, 5, 8, "auto"])
+@pytest.mark.parametrize("alpha", [True, False])
+def test_tiled_matches_regular_path(n_colors, alpha):
+    for seed in range(20):
+        pixels = np.asarray(make_logo(256, alpha, seed=seed))
+        count, colors = count_png_colors(pixels, n_colors=n_colors, tiled=False)
+        tiled_count, tiled_colors = count_png_colors(pixels, n_colors=n_colors, tiled=True)
+        assert tiled_count == count
+        regular = np.array([_rgb(label) for label in colors])
+        tiled = np.array([_rgb(label) for label in tiled_colors])
+        assert np.abs(regular[:, None, :] - tiled[None, :, :]).max(axis=2).min(axis=1).max() <= 1
+
+
+@pytest.mark.parametrize("options", [
+    {"engine": "kmeans"},
+    {"engine": "histogram"},
+    {"engine": "histogram", "n_colors": "auto"},
+    {"engine": "kmeans", "sample": "stride", "max_pixels": 1000},
+])
+def test_process_batch_matches_process_file(options):
+    options = dict(options, preview="none")
+    contents = [_png(logo) for logo in _logos()]
+    filenames = [f"logo{index}.png" for index in range(len(contents))]
+    for filename, content, result in zip(filenames, contents, process_batch(filenames, contents, options)):
+        single = process_file(filename, content, options)
+        assert (result["count"], sorted(result["colors"])) == (single["count"], sorted(single["colors"]))